@@ -4,9 +4,25 @@ except:
     import numpy as xp
 
 
-def address(array) -> int:
-    import numpy
-    if isinstance(array, numpy.ndarray):
-        return array.__array_interface__['data'][0]
-    else:
-        return array.__cuda_array_interface__['data'][0]
+_floatx = xp.dtype('float64')
+
+
+def floatx():
+    """
+    The default floating point type of parameters and computations. Models and layers use it unless they are given a
+    dtype of their own. float32 halves memory traffic and doubles the width of vector instructions compared to float64.
+    """
+    return _floatx
+
+
+def set_floatx(dtype):
+    global _floatx
+    _floatx = xp.dtype(dtype)
+
+
+def synchronize():
+    """
+    Waits until the device has finished all queued work, so that host timers measure it. Does nothing with NumPy.
+    """
+    if xp.__name__ == 'cupy':
+        xp.cuda.Stream.null.synchronize()
@@ -0,0 +1,46 @@
+import mmap
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy
+
+
+def fork_shared_array(shape: tuple, dtype) -> numpy.ndarray:
+    """
+    An array in an anonymous shared mapping, which processes forked after its creation share with the parent. The memory
+    is released when the last array using it is garbage collected, so nothing has to be unlinked.
+    """
+    dtype = numpy.dtype(dtype)
+    size = int(numpy.prod(shape, dtype=numpy.int64)) * dtype.itemsize
+    return numpy.frombuffer(mmap.mmap(-1, max(size, 1)), dtype=dtype, count=size // dtype.itemsize).reshape(shape)
+
+
+def limit_blas_threads():
+    """
+    Limits the BLAS library to one thread in this process and the processes forked from it, if threadpoolctl is
+    installed. Returns the limits, which can restore the original setting, or None.
+    """
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return None
+    return threadpool_limits(1)
+
+
+def share_array(array: numpy.ndarray) -> (SharedMemory, tuple):
+    """
+    Copies array into a new named shared memory block. Returns the block, which the caller has to close and unlink when
+    it is no longer needed, and a small picklable description from which any process can attach to the array.
+    """
+    array = numpy.ascontiguousarray(array)
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    numpy.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def attach_array(description: tuple) -> (SharedMemory, numpy.ndarray):
+    """
+    Attaches to an array shared with share_array. The block must be kept referenced as long as the array is used.
+    """
+    name, shape, dtype = description
+    block = SharedMemory(name=name)
+    return block, numpy.ndarray(shape, numpy.dtype(dtype), buffer=block.buf)
@@ -0,0 +1,20 @@
+from backend.backend import xp
+
+try:
+    if xp.__name__ == 'cupy':
+        import cupyx.scipy.sparse as sparse
+    else:
+        import scipy.sparse as sparse
+except ImportError:
+    sparse = None  # SciPy is optional, without it all inputs are dense
+
+
+def issparse(x) -> bool:
+    """
+    Whether x is a sparse matrix of the backend (scipy.sparse with NumPy, cupyx.scipy.sparse with CuPy).
+    """
+    return sparse is not None and sparse.issparse(x)
+
+
+def to_csr(x):
+    return x if x.format == 'csr' else x.tocsr()
@@ -0,0 +1,43 @@
+from typing import Dict
+
+from backend.backend import xp
+
+
+class Workspace:
+    """
+    A workspace is an arena of persistent buffers. The Model owns one instance and hands it to each of its layers, so the
+    outputs and gradients of a layer are written into the same memory on every minibatch instead of being allocated anew.
+
+    A buffer is identified by the layer that owns it, a tag ('out', 'dEdI', ...), its trailing dimensions and its dtype.
+    The leading (batch) dimension is not part of the key: the buffer is allocated for the largest batch seen so far, and a
+    smaller batch, such as the short last batch of an epoch, receives a view of its first rows. Such a view is still
+    contiguous, so after the first full batch a training step runs without allocating memory for its tensors.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[tuple, xp.ndarray] = {}
+
+    def get(self, owner: object, tag: str, shape: tuple, dtype=float) -> xp.ndarray:
+        """
+        Returns an uninitialized array of the requested shape and dtype. Consecutive calls with the same owner and tag
+        return the same memory, so the caller must not expect the content to survive until the next call.
+        """
+        shape = tuple(shape)
+        dtype = xp.dtype(dtype)
+        key = (id(owner), tag, shape[1:], dtype)
+
+        buffer = self._buffers.get(key)
+        if buffer is None or (len(shape) > 0 and buffer.shape[0] < shape[0]):
+            buffer = xp.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+
+        if len(shape) == 0 or buffer.shape[0] == shape[0]:
+            return buffer
+        return buffer[:shape[0]]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def clear(self):
+        self._buffers.clear()
@@ -0,0 +1,335 @@
+"""
+Benchmarks of the building blocks of the library and of end-to-end training.
+
+Run from the root of the repository:
+    python -m benchmarks.run_benchmarks [--quick] [--output results.json] [--baseline benchmarks/baseline.json]
+
+Every benchmark reports the median time of one call in seconds (keys ending in '/seconds') or a throughput in samples
+per second (keys ending in '/samples_per_second'). The results are written as JSON together with a description of the
+environment. If a baseline file exists, every result is compared with it and the command exits with status 1 when a
+benchmark became slower than the baseline by more than the tolerance. A new baseline is stored with --output
+benchmarks/baseline.json.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict
+
+import numpy
+import pandas as pd
+
+from backend.backend import xp, floatx, synchronize
+from layers.activation_functions.relu import ReLU
+from layers.activation_functions.sigmoid import Sigmoid
+from layers.activation_functions.softmax import Softmax
+from layers.activation_functions.tanh import Tanh
+from layers.convolutional.conv2d import Conv2D
+from layers.convolutional.pooling import AvgPool2D, MaxPool2D
+from layers.dense_layer import DenseLayer
+from layers.normalization.batch_normalization import BatchNormalization
+from layers.normalization.layer_normalization import LayerNormalization
+from layers.recurrent.gru import GRU
+from layers.recurrent.lstm import LSTM
+from layers.recurrent.rnn import RNN
+from loss_functions.binary_cross_entropy import BinaryCrossEntropy
+from loss_functions.cross_entropy import CrossEntropy
+from loss_functions.dkl import DKL
+from loss_functions.mse import MSE
+from models.feedforward_nn import Model
+from optimizers.adadelta import Adadelta
+from optimizers.adagrad import Adagrad
+from optimizers.adam import Adam
+from optimizers.adamax import AdaMax
+from optimizers.amsgrad import AMSGrad
+from optimizers.momentum import Momentum
+from optimizers.rmsprop import RMSProp
+from optimizers.sgd import SGD
+from optimizers.sparse_gradient import SparseGradient
+from utils.dataset import Dataset
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def measure(function: Callable, repeat: int = 7, min_time: float = 0.05) -> float:
+    """
+    Median time of one call of function in seconds. The function is called once to warm up (buffers are allocated on the
+    first call), then in repeat rounds of as many calls as needed to run for at least min_time.
+    """
+    function()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return float(numpy.median(times))
+
+
+def benchmark_layers(batch_size: int, units: int, repeat: int) -> Dict[str, float]:
+    layers = {
+        'DenseLayer': lambda: DenseLayer(units, units),
+        'ReLU': ReLU,
+        'Sigmoid': Sigmoid,
+        'Tanh': Tanh,
+        'Softmax': Softmax,
+        'BatchNormalization': BatchNormalization,
+        'LayerNormalization': LayerNormalization,
+    }
+    x = xp.random.normal(size=(batch_size, units)).astype(floatx())
+    return time_layers(layers, x, repeat)
+
+
+def benchmark_image_layers(batch_size: int, channels: int, size: int, repeat: int) -> Dict[str, float]:
+    layers = {
+        'Conv2D': lambda: Conv2D(channels, channels, 3, padding=1),
+        'MaxPool2D': MaxPool2D,
+        'AvgPool2D': AvgPool2D,
+    }
+    x = xp.random.normal(size=(batch_size, channels, size, size)).astype(floatx())
+    return time_layers(layers, x, repeat)
+
+
+def benchmark_sequence_layers(batch_size: int, steps: int, units: int, repeat: int) -> Dict[str, float]:
+    layers = {
+        'RNN': lambda: RNN(units, units),
+        'LSTM': lambda: LSTM(units, units),
+        'GRU': lambda: GRU(units, units),
+    }
+    x = xp.random.normal(size=(batch_size, steps, units)).astype(floatx())
+    return time_layers(layers, x, repeat)
+
+
+def time_layers(layers: Dict[str, Callable], x: xp.ndarray, repeat: int) -> Dict[str, float]:
+    results = {}
+    for name, create in layers.items():
+        model = Model(name='benchmark')
+        model.add_layer(create())
+        model.training = True
+        layer = model._layers[0]
+        g = xp.random.normal(size=layer.forward(x).shape).astype(floatx())
+
+        def forward():
+            layer.forward(x)
+            synchronize()
+
+        def backward():
+            layer.backward(g)
+            synchronize()
+
+        results['layer/{}/forward/seconds'.format(name)] = measure(forward, repeat)
+        results['layer/{}/backward/seconds'.format(name)] = measure(backward, repeat)
+    return results
+
+
+def benchmark_losses(batch_size: int, classes: int, repeat: int) -> Dict[str, float]:
+    results = {}
+    logits = xp.random.normal(size=(batch_size, classes)).astype(floatx())
+    classes_of_samples = xp.random.randint(0, classes, batch_size)
+    labels = xp.eye(classes, dtype=floatx())[classes_of_samples]
+    binary = xp.random.randint(0, 2, (batch_size, 1)).astype(floatx())
+    losses = {
+        'MSE': (MSE(), logits, labels),
+        'CrossEntropy': (CrossEntropy(from_logits=True), logits, labels),
+        'DKL': (DKL(from_logits=True), logits, labels),
+        'CrossEntropy(labels)': (CrossEntropy(from_logits=True, one_hot=False), logits, classes_of_samples),
+        'DKL(labels)': (DKL(from_logits=True, one_hot=False), logits, classes_of_samples),
+        'BinaryCrossEntropy': (BinaryCrossEntropy(from_logits=True), logits[:, :1], binary),
+    }
+    for name, (loss, y, t) in losses.items():
+        def value_and_grad():
+            loss.value_and_grad(y, t)
+            synchronize()
+
+        results['loss/{}/value_and_grad/seconds'.format(name)] = measure(value_and_grad, repeat)
+    return results
+
+
+def benchmark_optimizers(size: int, repeat: int) -> Dict[str, float]:
+    results = {}
+    optimizers = {'SGD': SGD, 'Momentum': Momentum, 'Adagrad': Adagrad, 'RMSProp': RMSProp, 'Adadelta': Adadelta,
+                  'Adam': Adam, 'AdaMax': AdaMax, 'AMSGrad': AMSGrad}
+    for name, create in optimizers.items():
+        param = xp.random.normal(size=size).astype(floatx())
+        grad = xp.random.normal(size=size).astype(floatx()) * 1e-3
+        optimizer = create()
+        group = optimizer.register([param], [grad])
+
+        def step():
+            optimizer.step(group)
+            synchronize()
+
+        results['optimizer/{}/step/seconds'.format(name)] = measure(step, repeat)
+    return results
+
+
+def benchmark_sparse_optimizers(rows: int, units: int, batch_size: int, repeat: int) -> Dict[str, float]:
+    """
+    Steps on an embedding-style table of which every minibatch touches batch_size rows, with lazy updates of the rows.
+    """
+    results = {}
+    optimizers = {'SGD': SGD, 'Momentum': lambda: Momentum(lazy=True), 'Adagrad': Adagrad, 'RMSProp': RMSProp,
+                  'Adam': lambda: Adam(lazy=True)}
+    rows_in_batch = xp.unique(xp.random.randint(0, rows, batch_size))
+    values = xp.random.normal(size=(len(rows_in_batch), units)).astype(floatx()) * 1e-3
+    for name, create in optimizers.items():
+        param = xp.random.normal(size=(rows, units)).astype(floatx())
+        grad = xp.zeros_like(param)
+        sparse = SparseGradient(axis=0)
+        optimizer = create()
+        group = optimizer.register([param], [grad], [sparse])
+
+        def step():
+            sparse.scatter(grad, rows_in_batch, values)
+            optimizer.step(group)
+            synchronize()
+
+        results['optimizer/{}/sparse_step/seconds'.format(name)] = measure(step, repeat)
+    return results
+
+
+def load_csv(name: str) -> (xp.ndarray, xp.ndarray):
+    data = xp.array(pd.read_csv(os.path.join(DATA_DIR, name + '.csv')).values, dtype=floatx())
+    x, y = data[:, :-1], data[:, -1:]
+    x = (x - x.mean(axis=0)) / (x.std(axis=0) + 1e-8)
+    if name == 'housing':
+        y = (y - y.mean()) / y.std()
+    return x, y
+
+
+def fit_samples_per_second(x: xp.ndarray, y: xp.ndarray, loss, units: int, batch_size: int, epochs: int) -> float:
+    xp.random.seed(0)
+    model = Model(loss, name='benchmark')
+    model.add_layer(DenseLayer(x.shape[1], units))
+    model.add_layer(ReLU())
+    model.add_layer(DenseLayer(units, units))
+    model.add_layer(ReLU())
+    model.add_layer(DenseLayer(units, y.shape[1]))
+    model.set_optimizer(Adam())
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.fit(Dataset(x, y), batch_size=batch_size, max_epochs=1, eps=0, save=False)
+        start = time.perf_counter()
+        model.fit(Dataset(x, y), batch_size=batch_size, max_epochs=epochs, eps=0, print_every=epochs + 1, save=False)
+        synchronize()
+        elapsed = time.perf_counter() - start
+    return len(x) * epochs / elapsed
+
+
+def benchmark_fit(quick: bool) -> Dict[str, float]:
+    results = {}
+    epochs = 2 if quick else 10
+    datasets = {
+        'banknote_authentication': BinaryCrossEntropy(from_logits=True),
+        'heart': BinaryCrossEntropy(from_logits=True),
+        'housing': MSE(),
+    }
+    for name, loss in datasets.items():
+        x, y = load_csv(name)
+        results['fit/{}/samples_per_second'.format(name)] = fit_samples_per_second(x, y, loss, 32, 32, epochs)
+
+    sizes = [(10000, 32, 4)] if quick else [(10000, 32, 4), (50000, 128, 10), (20000, 784, 10)]
+    for n, features, classes in sizes:
+        x = xp.random.normal(size=(n, features)).astype(floatx())
+        y = xp.eye(classes, dtype=floatx())[xp.random.randint(0, classes, n)]
+        key = 'fit/synthetic_{}x{}/samples_per_second'.format(n, features)
+        results[key] = fit_samples_per_second(x, y, CrossEntropy(from_logits=True), 128, 128, max(1, epochs // 5))
+    return results
+
+
+def run(quick: bool = False) -> Dict[str, float]:
+    repeat = 3 if quick else 7
+    results = {}
+    results.update(benchmark_layers(256, 256, repeat))
+    results.update(benchmark_image_layers(32, 16, 28, repeat))
+    results.update(benchmark_sequence_layers(32, 50, 128, repeat))
+    results.update(benchmark_losses(256, 10, repeat))
+    results.update(benchmark_optimizers(1 << 16 if quick else 1 << 20, repeat))
+    results.update(benchmark_sparse_optimizers(1 << 14 if quick else 1 << 18, 64, 256, repeat))
+    results.update(benchmark_fit(quick))
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': str(os.cpu_count()),
+        'backend': xp.__name__,
+        'backend_version': xp.__version__,
+        'floatx': str(floatx()),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> list:
+    """
+    Returns (key, baseline, result, slowdown) for every benchmark present in both, where slowdown is the ratio of the new
+    time to the baseline time (throughputs are inverted first), so values above 1 + tolerance are regressions.
+    """
+    rows = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        if key.endswith('/samples_per_second'):
+            slowdown = baseline[key] / results[key]
+        else:
+            slowdown = results[key] / baseline[key]
+        rows.append((key, baseline[key], results[key], slowdown))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='smaller problems and fewer repetitions')
+    parser.add_argument('--output', help='file for the results in JSON')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    results = run(args.quick)
+    report = {'environment': environment(), 'quick': args.quick, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+
+    if not os.path.exists(args.baseline):
+        for key in sorted(results):
+            print('{:60s} {:14.6g}'.format(key, results[key]))
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get('quick') != args.quick:
+        print('The baseline was recorded {} --quick, the results cannot be compared'.format(
+            'with' if baseline.get('quick') else 'without'))
+        return 1
+    baseline = baseline['results']
+
+    regressions = 0
+    for key, old, new, slowdown in compare(results, baseline, args.tolerance):
+        regression = slowdown > 1 + args.tolerance
+        regressions += regression
+        print('{:60s} {:14.6g} {:14.6g} {:8.2f}x{}'.format(key, old, new, slowdown, '  REGRESSION' if regression else ''))
+    print('{} regression(s) beyond {:.0%}'.format(regressions, args.tolerance))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
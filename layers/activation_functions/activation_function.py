@@ -10,12 +10,15 @@ class ActivationFunction(Function):
 
     For all activation functions except Softmax, the i-th output depends only on the i-th input. In the general case, the
     derivative would be a Nb × n × n tensor (Nb = batch size, n = number of features), representing a batch of Jacobian
-    matrices. Under the assumption above, each Jacobian is diagonal (except for Softmax).
+    matrices. Under the assumption above, each Jacobian is diagonal (except for Softmax, which overrides backward).
 
     During backpropagation, the gradient w.r.t. the activation’s output is multiplied by this derivative. Since multiplying a
     row by a diagonal matrix reduces to elementwise multiplication with the diagonal, implementations usually exploit this.
     Therefore, derivative returns an array with the same shape as the input, and the actual elementwise product is applied
-    later.
+    later. Both the derivative and the product are written into workspace buffers.
+
+    Activations whose derivative follows from what the forward pass produced anyway (Sigmoid, Tanh and ReLU) keep that
+    instead of their inputs and override backward with a single fused pass; deriv remains available for them.
     """
 
     def __init__(self, name: str = None):
@@ -26,12 +29,10 @@ class ActivationFunction(Function):
         pass
 
     def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
-        from layers.activation_functions.softmax import Softmax
-
-        if isinstance(self, Softmax):
-            dEdO = dEdO.reshape((dEdO.shape[0], 1, dEdO.shape[-1]))
-            dEdI = xp.matmul(dEdO, self.deriv(self._inputs))
-            return dEdI.reshape((dEdI.shape[0], dEdI.shape[-1]))
+        dEdI = self._buffer('dEdI', dEdO.shape, dEdO.dtype)
+        return xp.multiply(dEdO, self.deriv(self._inputs), out=dEdI)
 
-        return xp.multiply(dEdO, self.deriv(self._inputs))
+    @staticmethod
+    def _float_type(x: xp.ndarray):
+        return xp.result_type(x, 1.0)
 
@@ -6,14 +6,47 @@ class Sigmoid(ActivationFunction):
     """
     s(x) = 1 / (1 + exp(-x))
     dsdx = s(x) * (1 - s(x))
+
+    The derivative can also be written as dsdx = 1 / (2 + 2cosh(x)), which is evaluated in a single buffer without
+    computing s(x) first.
+
+    During training the outputs are kept instead of the inputs, and backward computes dE/dx = g · s(x) · (1 − s(x)) from
+    them in place, so no exponential is evaluated a second time.
     """
 
     def __init__(self, name: str = "Sigmoid"):
         super().__init__(name)
+        self._outputs: xp.ndarray = None
+
+    def _pre_fw(self, inputs: xp.ndarray):
+        pass  # backward needs only the outputs
 
     def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
-        return 1 / (1 + xp.exp(-inputs))
+        out = self._buffer('out', inputs.shape, self._float_type(inputs))
+        xp.negative(inputs, out=out)
+        xp.exp(out, out=out)
+        out += 1
+        xp.reciprocal(out, out=out)
+
+        if self._training:
+            self._outputs = out
+        return out
+
+    def release(self):
+        super().release()
+        self._outputs = None
 
     def deriv(self, x: xp.ndarray) -> xp.ndarray:
-        y = self(x)
-        return y * (1 - y)
+        df = self._buffer('deriv', x.shape, self._float_type(x))
+        xp.cosh(x, out=df)
+        df *= 2
+        df += 2
+        return xp.reciprocal(df, out=df)
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        s = self._outputs
+        dEdI = self._buffer('dEdI', dEdO.shape, xp.result_type(dEdO, s))
+        xp.subtract(1, s, out=dEdI)
+        dEdI *= s
+        dEdI *= dEdO
+        return dEdI
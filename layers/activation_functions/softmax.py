@@ -1,3 +1,5 @@
+from typing import Tuple
+
 from backend.backend import xp
 from layers.activation_functions.activation_function import ActivationFunction
 
@@ -17,25 +19,78 @@ class Softmax(ActivationFunction):
 
     Because of this simplification, a practical implementation often skips explicit backward computation for Softmax and
     directly returns output − target.
+
+    When Softmax is used as a layer, backward never builds the Jacobian. Multiplying the gradient g by the Jacobian gives
+    dE/dXi = Si (gi − sum_j gj Sj), which is computed in one vectorized pass over any number of leading dimensions (a
+    batch Nb × n, or a batch of sequences Nb × T × n). The outputs S are remembered during the forward pass for this
+    purpose, so backward does not evaluate the exponentials again.
     """
 
     def __init__(self, name: str = "Softmax"):
         super().__init__(name)
+        self._outputs: xp.ndarray = None
 
     def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
-        y = xp.exp(inputs)
-        tmp = xp.sum(y, axis=-1, keepdims=True)
-        return xp.divide(y, tmp)
+        y = self._buffer('out', inputs.shape, self._float_type(inputs))
+        tmp = self._buffer('sum', inputs.shape[:-1] + (1,), y.dtype)
+
+        # Softmax(x) = Softmax(x − max(x)), and exp of a non-positive number cannot overflow
+        xp.max(inputs, axis=-1, keepdims=True, out=tmp)
+        xp.subtract(inputs, tmp, out=y)
+        xp.exp(y, out=y)
+        xp.sum(y, axis=-1, keepdims=True, out=tmp)
+        xp.divide(y, tmp, out=y)
+
+        if self._training:
+            self._outputs = y
+        return y
+
+    def release(self):
+        super().release()
+        self._outputs = None
 
     def deriv(self, x: xp.ndarray) -> xp.ndarray:
+        """
+        Returns the full Jacobian, an array of shape x.shape + (n,). It is not used by backward.
+        """
         y = self(x)
-        dx = xp.zeros((y.shape[0], y.shape[1], y.shape[1]))
-        for batch_index in range(y.shape[0]):
-            dx[batch_index, :, :] = -xp.matmul(y[batch_index, :].reshape(-1, 1),
-                                               y[batch_index, :].reshape(-1, 1).T)
-
-            dx[batch_index, :, :] += xp.diagflat(y[batch_index, :])
+        n = y.shape[-1]
+        dx = -y[..., :, None] * y[..., None, :]
+        diagonal = xp.arange(n)
+        dx[..., diagonal, diagonal] += y
 
         return dx
 
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        s = self._outputs
+        dEdI = self._buffer('dEdI', dEdO.shape, xp.result_type(dEdO, s))
+        g_dot_s = self._buffer('g_dot_s', dEdO.shape[:-1] + (1,), dEdI.dtype)
+
+        xp.multiply(dEdO, s, out=dEdI)
+        xp.sum(dEdI, axis=-1, keepdims=True, out=g_dot_s)
+        xp.subtract(dEdO, g_dot_s, out=dEdI)
+        dEdI *= s
+
+        return dEdI
+
+
+
+def log_softmax(x: xp.ndarray, log_probs: xp.ndarray = None, probs: xp.ndarray = None) -> Tuple[xp.ndarray, xp.ndarray]:
+    """
+    Computes log(Softmax(x)) with the log-sum-exp trick, log Si = xi − m − log sum_j exp(xj − m) with m = max(x), which
+    stays finite for arbitrarily large inputs. Softmax(x) itself is a by-product, so both arrays are returned; they are
+    written into log_probs and probs when those are given.
+    """
+    dtype = xp.result_type(x, 1.0)
+    if log_probs is None:
+        log_probs = xp.empty(x.shape, dtype=dtype)
+    if probs is None:
+        probs = xp.empty(x.shape, dtype=dtype)
+
+    xp.subtract(x, xp.max(x, axis=-1, keepdims=True), out=log_probs)
+    xp.exp(log_probs, out=probs)
+    total = xp.sum(probs, axis=-1, keepdims=True)
+    probs /= total
+    log_probs -= xp.log(total)
 
+    return log_probs, probs
@@ -3,14 +3,43 @@ from layers.activation_functions.activation_function import ActivationFunction
 
 
 class Tanh(ActivationFunction):
+    """
+    tanh(x) = (exp(x) − exp(−x)) / (exp(x) + exp(−x))
+    dtanh/dx = 1 − tanh²(x)
+
+    During training the outputs are kept instead of the inputs, and backward computes dE/dx = g · (1 − y²) from them in
+    place, so tanh is not evaluated a second time.
+    """
+
     def __init__(self, name: str = "Tanh"):
         super().__init__(name)
+        self._outputs: xp.ndarray = None
+
+    def _pre_fw(self, inputs: xp.ndarray):
+        pass  # backward needs only the outputs
 
     def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
-        ex = xp.exp(inputs)
-        emx = xp.exp(-inputs)
-        return (ex - emx) / (ex+emx)
+        out = self._buffer('out', inputs.shape, self._float_type(inputs))
+        xp.tanh(inputs, out=out)
+
+        if self._training:
+            self._outputs = out
+        return out
+
+    def release(self):
+        super().release()
+        self._outputs = None
 
     def deriv(self, x: xp.ndarray) -> xp.ndarray:
-        tanh = self(x)
-        return 1 - tanh*tanh
+        df = self._buffer('deriv', x.shape, self._float_type(x))
+        xp.tanh(x, out=df)
+        xp.multiply(df, df, out=df)
+        return xp.subtract(1, df, out=df)
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        y = self._outputs
+        dEdI = self._buffer('dEdI', dEdO.shape, xp.result_type(dEdO, y))
+        xp.multiply(y, y, out=dEdI)
+        xp.subtract(1, dEdI, out=dEdI)
+        dEdI *= dEdO
+        return dEdI
@@ -0,0 +1,120 @@
+from typing import Tuple, Union
+
+from backend.backend import xp
+from layers.convolutional.windows import offset_view, output_size, pair, windows
+from models.adaptive_object import AdaptiveObject
+from weight_initializers.random_initialize import rand_init
+
+
+class Conv2D(AdaptiveObject):
+    """
+    A 2-D convolution (strictly speaking a cross-correlation, as in all deep learning libraries) of inputs of shape
+    Nb × C_in × H × W with C_out kernels of shape C_in × kh × kw, giving outputs of shape Nb × C_out × H_out × W_out with
+    H_out = (H + 2·padding − kh) // stride + 1, and the same for the width.
+
+    The convolution is computed with im2col: the windows of the (zero padded) inputs are taken as a strided view, which
+    copies nothing, and copied once into a column matrix with C_in·kh·kw rows and Nb·H_out·W_out columns. The outputs are
+    then a single matrix product of the C_out × C_in·kh·kw weight matrix with the columns. backward is two more products,
+    dE/dW = dE/dO · columnsᵀ for the weights and W^T · dE/dO for the gradient of the columns, which is added back to the
+    inputs with one vectorized addition per kernel position (col2im); no Python loop runs over samples or pixels. The
+    columns, which are kept for backward, and all other intermediates live in workspace buffers.
+    """
+
+    _trainable = (('_W', '_dEdW'), ('_b', '_dEdb'))
+
+    def __init__(self, in_channels: int, out_channels: int, kernel_size: Union[int, Tuple[int, int]],
+                 stride: Union[int, Tuple[int, int]] = 1, padding: Union[int, Tuple[int, int]] = 0,
+                 weight_init_method: str = 'xavier_uniform', name: str = 'unnamed', dtype=None):
+        super().__init__(name)
+        self.dtype = dtype
+        self.kernel_size = pair(kernel_size)
+        self.stride = pair(stride)
+        self.padding = pair(padding)
+
+        kh, kw = self.kernel_size
+        self._W = rand_init(out_channels, in_channels * kh * kw, init_mode=weight_init_method, dtype=self.dtype)
+        self._W = self._W.reshape(out_channels, in_channels, kh, kw)
+        self._b = xp.zeros((out_channels, ), dtype=self.dtype)
+        self._dEdW = xp.zeros_like(self._W)
+        self._dEdb = xp.zeros_like(self._b)
+
+        self._columns: xp.ndarray = None
+
+    @property
+    def parameters(self) -> tuple:
+        return self._W, self._b
+
+    @parameters.setter
+    def parameters(self, val: tuple):
+        self._W, self._b = val
+
+    def _pad(self, inputs: xp.ndarray) -> xp.ndarray:
+        ph, pw = self.padding
+        if ph == 0 and pw == 0:
+            return inputs
+
+        n, c, h, w = inputs.shape
+        padded = self._buffer('padded', (n, c, h + 2 * ph, w + 2 * pw), inputs.dtype)
+        padded[:, :, :ph] = 0
+        padded[:, :, h + ph:] = 0
+        padded[:, :, :, :pw] = 0
+        padded[:, :, :, w + pw:] = 0
+        padded[:, :, ph: h + ph, pw: w + pw] = inputs
+        return padded
+
+    def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
+        n = inputs.shape[0]
+        c_out, c_in, kh, kw = self._W.shape
+        padded = self._pad(inputs)
+        h_out = output_size(padded.shape[2], kh, self.stride[0])
+        w_out = output_size(padded.shape[3], kw, self.stride[1])
+
+        # columns[c, i, j, sample, y, x] = padded[sample, c, y·stride + i, x·stride + j]
+        columns = self._buffer('columns', (c_in, kh, kw, n, h_out, w_out), self._W.dtype)
+        columns[...] = windows(padded, (kh, kw), self.stride).transpose(1, 4, 5, 0, 2, 3)
+        columns = columns.reshape(c_in * kh * kw, n * h_out * w_out)
+
+        products = self._buffer('products', (c_out, n * h_out * w_out), self._W.dtype)
+        xp.matmul(self._W.reshape(c_out, -1), columns, out=products)
+
+        out = self._buffer('out', (n, c_out, h_out, w_out), self._W.dtype)
+        xp.add(products.reshape(c_out, n, h_out, w_out).transpose(1, 0, 2, 3), self._b[:, None, None], out=out)
+
+        if self._training:
+            self._columns = columns
+        return out
+
+    def release(self):
+        super().release()
+        self._columns = None
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        n, c_out, h_out, w_out = dEdO.shape
+        _, c_in, kh, kw = self._W.shape
+        dtype = xp.result_type(dEdO, self._W)
+
+        # dE/dO with the channels first, matching the columns of the forward pass
+        dEdO_2d = self._buffer('dEdO_2d', (c_out, n, h_out, w_out), dtype)
+        dEdO_2d[...] = dEdO.transpose(1, 0, 2, 3)
+        dEdO_2d = dEdO_2d.reshape(c_out, -1)
+
+        xp.sum(dEdO_2d, axis=1, out=self._dEdb)
+        xp.matmul(dEdO_2d, self._columns.T, out=self._dEdW.reshape(c_out, -1))
+
+        dEdC = self._buffer('dEdC', (c_in * kh * kw, n * h_out * w_out), dtype)
+        xp.matmul(self._W.reshape(c_out, -1).T, dEdO_2d, out=dEdC)
+        dEdC = dEdC.reshape(c_in, kh, kw, n, h_out, w_out)
+
+        ph, pw = self.padding
+        _, _, h, w = self._inputs.shape
+        dEdP = self._buffer('dEdP', (n, c_in, h + 2 * ph, w + 2 * pw), dtype)
+        dEdP.fill(0)
+        for i in range(kh):
+            for j in range(kw):
+                offset_view(dEdP, i, j, (h_out, w_out), self.stride)[...] += dEdC[:, i, j].transpose(1, 0, 2, 3)
+
+        if ph == 0 and pw == 0:
+            return dEdP
+        dEdI = self._buffer('dEdI', self._inputs.shape, dtype)
+        dEdI[...] = dEdP[:, :, ph: h + ph, pw: w + pw]
+        return dEdI
@@ -0,0 +1,87 @@
+from typing import Tuple, Union
+
+from backend.backend import xp
+from layers.convolutional.windows import offset_view, output_size, pair, windows
+from layers.function import Function
+
+
+class MaxPool2D(Function):
+    """
+    Takes the maximum of every pool_size window of inputs of shape Nb × C × H × W, moving the window by stride (pool_size
+    by default), which gives outputs of shape Nb × C × H_out × W_out with H_out = (H − ph) // stride + 1.
+
+    The windows are a strided view of the inputs. During training they are copied into one contiguous buffer, from which
+    the maxima and the position of every maximum are taken with one reduction each; backward routes the gradient to
+    these positions with one vectorized addition per position of the window.
+    """
+
+    def __init__(self, pool_size: Union[int, Tuple[int, int]] = 2, stride: Union[int, Tuple[int, int]] = None,
+                 name: str = 'MaxPool2D'):
+        super().__init__(name)
+        self.pool_size = pair(pool_size)
+        self.stride = pair(stride) if stride is not None else self.pool_size
+        self._argmax: xp.ndarray = None
+
+    def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
+        n, c, h, w = inputs.shape
+        ph, pw = self.pool_size
+        shape = (n, c, output_size(h, ph, self.stride[0]), output_size(w, pw, self.stride[1]))
+        view = windows(inputs, self.pool_size, self.stride)
+        out = self._buffer('out', shape, inputs.dtype)
+        if not self._training:
+            return xp.max(view, axis=(4, 5), out=out)
+
+        patches = self._buffer('patches', shape + self.pool_size, inputs.dtype)
+        patches[...] = view
+        patches = patches.reshape(shape + (ph * pw, ))
+        self._argmax = self._buffer('argmax', shape, xp.intp)
+        xp.argmax(patches, axis=-1, out=self._argmax)
+        return xp.max(patches, axis=-1, out=out)
+
+    def release(self):
+        super().release()
+        self._argmax = None
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        ph, pw = self.pool_size
+        dEdI = self._buffer('dEdI', self._inputs.shape, dEdO.dtype)
+        routed = self._buffer('routed', dEdO.shape, dEdO.dtype)
+        mask = self._buffer('mask', dEdO.shape, bool)
+        dEdI.fill(0)
+        for k in range(ph * pw):
+            xp.equal(self._argmax, k, out=mask)
+            xp.multiply(dEdO, mask, out=routed)
+            offset_view(dEdI, k // pw, k % pw, dEdO.shape[2:], self.stride)[...] += routed
+        return dEdI
+
+
+class AvgPool2D(Function):
+    """
+    Takes the mean of every pool_size window of inputs of shape Nb × C × H × W, moving the window by stride (pool_size by
+    default). The mean is reduced directly from a strided view of the windows, and backward spreads dE/dO / (ph·pw)
+    over every window with one vectorized addition per position of the window.
+    """
+
+    def __init__(self, pool_size: Union[int, Tuple[int, int]] = 2, stride: Union[int, Tuple[int, int]] = None,
+                 name: str = 'AvgPool2D'):
+        super().__init__(name)
+        self.pool_size = pair(pool_size)
+        self.stride = pair(stride) if stride is not None else self.pool_size
+
+    def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
+        n, c, h, w = inputs.shape
+        ph, pw = self.pool_size
+        shape = (n, c, output_size(h, ph, self.stride[0]), output_size(w, pw, self.stride[1]))
+        out = self._buffer('out', shape, xp.result_type(inputs, 1.0))
+        return xp.mean(windows(inputs, self.pool_size, self.stride), axis=(4, 5), out=out)
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        ph, pw = self.pool_size
+        dEdI = self._buffer('dEdI', self._inputs.shape, dEdO.dtype)
+        share = self._buffer('share', dEdO.shape, dEdO.dtype)
+        xp.divide(dEdO, ph * pw, out=share)
+        dEdI.fill(0)
+        for i in range(ph):
+            for j in range(pw):
+                offset_view(dEdI, i, j, dEdO.shape[2:], self.stride)[...] += share
+        return dEdI
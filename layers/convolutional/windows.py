@@ -0,0 +1,28 @@
+from typing import Tuple, Union
+
+from backend.backend import xp
+
+
+def pair(value: Union[int, Tuple[int, int]]) -> Tuple[int, int]:
+    return (value, value) if isinstance(value, int) else tuple(value)
+
+
+def output_size(size: int, window: int, stride: int) -> int:
+    return (size - window) // stride + 1
+
+
+def windows(x: xp.ndarray, window: Tuple[int, int], stride: Tuple[int, int]) -> xp.ndarray:
+    """
+    A read-only strided view of shape N × C × H_out × W_out × kh × kw of the windows of an N × C × H × W array; the
+    windows are not copied.
+    """
+    view = xp.lib.stride_tricks.sliding_window_view(x, window, axis=(2, 3))
+    return view[:, :, ::stride[0], ::stride[1]]
+
+
+def offset_view(x: xp.ndarray, i: int, j: int, out_shape: Tuple[int, int], stride: Tuple[int, int]) -> xp.ndarray:
+    """
+    The writable strided view of the elements of x at position (i, j) of every window, of shape N × C × H_out × W_out.
+    Adding to it for every (i, j) of the window scatters values back to the input, as backward passes do.
+    """
+    return x[:, :, i: i + stride[0] * (out_shape[0] - 1) + 1: stride[0], j: j + stride[1] * (out_shape[1] - 1) + 1: stride[1]]
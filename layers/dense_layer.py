@@ -1,5 +1,7 @@
 from models.adaptive_object import AdaptiveObject
 from backend.backend import xp
+from backend.sparse import issparse, to_csr
+from optimizers.sparse_gradient import SparseGradient
 from weight_initializers.random_initialize import rand_init
 
 
@@ -9,15 +11,38 @@ class DenseLayer(AdaptiveObject):
     W has shape n × n_prev, and b is a vector of size n.
 
     Because this layer contains trainable parameters, its parent class is AdaptiveObject.
+
+    Gradients of the weights are kept in arrays of the same shape as the weights and are overwritten on every backward
+    pass. Inputs with more than two dimensions (for example Nb × T × n_prev sequences) are flattened to a matrix for the
+    weight gradient, so both cases are computed with a single matrix multiplication.
+
+    Outputs have the dtype of the weights, whatever the dtype of the inputs.
+
+    The inputs may also be a sparse matrix (SciPy CSR, or any format convertible to it), for example hashed features
+    that are far too wide to be densified. Only the columns of W belonging to features present in the minibatch take
+    part: the forward pass multiplies the minibatch, restricted to these k columns, by the matching k columns of W, and
+    the weight gradient is computed for these columns alone and scattered into the gradient array (see SparseGradient),
+    so a step costs O(nnz · n + k · n) instead of O(n_prev · n). Optimizers that support it, such as SGD, then update
+    only these columns. No gradient is propagated to sparse inputs (backward returns None), so a layer receiving them
+    must be the first layer of the model.
     """
 
-    def __init__(self, input_units: int, output_units: int, weight_init_method: str = 'xavier_uniform', name: str = 'unnamed'):
+    _trainable = (('_W', '_dEdW'), ('_b', '_dEdb'))
+    _sparse = {'_dEdW': '_dEdW_sparse'}
+
+    def __init__(self, input_units: int, output_units: int, weight_init_method: str = 'xavier_uniform', name: str = 'unnamed',
+                 dtype=None):
         super().__init__(name)
+        self.dtype = dtype
+
+        self._W = rand_init(output_units, input_units, init_mode=weight_init_method, dtype=self.dtype)
+        self._b = xp.zeros((output_units, ), dtype=self.dtype)
+        self._dEdW = xp.zeros_like(self._W)
+        self._dEdb = xp.zeros_like(self._b)
+        self._dEdW_sparse = SparseGradient(axis=1)
 
-        self._W = rand_init(output_units, input_units, init_mode=weight_init_method)
-        self._b = xp.zeros((output_units, ), dtype=float)
-        self._dEdW = None
-        self._dEdb = None
+        self._columns: xp.ndarray = None  # features present in the last sparse minibatch
+        self._sparse_inputs = None  # the last sparse minibatch restricted to these columns
 
     @property
     def parameters(self) -> tuple:
@@ -28,21 +53,45 @@ class DenseLayer(AdaptiveObject):
         self._W, self._b = val
 
     def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
-        return xp.matmul(inputs, self._W.T) + self._b
+        out = self._buffer('out', inputs.shape[:-1] + self._b.shape, self._W.dtype)
+        if issparse(inputs):
+            return self._sparse_forward(to_csr(inputs), out)
 
-    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
-        einsum_expression = 'ki,kj->ij'  # same as A.T x B
+        xp.matmul(inputs, self._W.T, out=out)
+        out += self._b
+        return out
+
+    def _sparse_forward(self, inputs, out: xp.ndarray) -> xp.ndarray:
+        columns = xp.unique(inputs.indices)
+        restricted = type(inputs)((inputs.data, xp.searchsorted(columns, inputs.indices), inputs.indptr),
+                                  shape=(inputs.shape[0], len(columns)))
+        W_columns = self._W[:, columns]
+        out[...] = restricted @ W_columns.T
+        out += self._b
+
+        if self._training:
+            self._columns = columns
+            self._sparse_inputs = restricted
+        return out
 
-        if self._inputs.ndim == 3:
-            einsum_expression = 'kti,ktj->ij'
+    def release(self):
+        super().release()
+        self._columns = None
+        self._sparse_inputs = None
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        if issparse(self._inputs):
+            dEdO_2d = dEdO.reshape(-1, dEdO.shape[-1])
+            self._dEdW_sparse.scatter(self._dEdW, self._columns, (self._sparse_inputs.T @ dEdO_2d).T)
+            xp.sum(dEdO_2d, axis=0, out=self._dEdb)
+            return None
 
-        self._dEdW = xp.einsum(einsum_expression, dEdO, self._inputs)
-        self._dEdb = xp.sum(dEdO, axis=tuple(range(dEdO.ndim - 1)))
+        inputs = self._inputs.reshape(-1, self._inputs.shape[-1])
+        dEdO_2d = dEdO.reshape(-1, dEdO.shape[-1])
 
-        return xp.matmul(dEdO, self._W)
+        xp.matmul(dEdO_2d.T, inputs, out=self._dEdW)  # sum over the batch (and time) of outer products
+        self._dEdW_sparse.reset()
+        xp.sum(dEdO_2d, axis=0, out=self._dEdb)
 
-    def update_parameters(self):
-        self._optimizer.update_parameters(self._W, self._dEdW)
-        self._optimizer.update_parameters(self._b, self._dEdb)
-        self._dEdW = None
-        self._dEdb = None
\ No newline at end of file
+        dEdI = self._buffer('dEdI', self._inputs.shape, xp.result_type(dEdO, self._W))
+        return xp.matmul(dEdO, self._W, out=dEdI)
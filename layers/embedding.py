@@ -0,0 +1,46 @@
+from backend.backend import xp
+from models.adaptive_object import AdaptiveObject
+from optimizers.sparse_gradient import SparseGradient
+
+
+class Embedding(AdaptiveObject):
+    """
+    Maps integer indices (for example the character indices of generate_int_sequences) to rows of a trainable
+    vocabulary_size × units matrix E. Inputs of any shape Nb × ... give outputs of shape Nb × ... × units; this equals
+    multiplying one-hot vectors by E without ever building them.
+
+    The forward pass gathers the rows with one take. The gradient of E is nonzero only in the rows of the indices present
+    in the minibatch: backward sums dE/dO over the occurrences of every index with a scatter-add into a table of these
+    rows and writes it into the gradient of E as a SparseGradient, so SGD updates only these rows. No gradient is
+    propagated to the indices (backward returns None), so the layer must be the first of the model.
+    """
+
+    _trainable = (('_E', '_dEdE'), )
+    _sparse = {'_dEdE': '_dEdE_sparse'}
+
+    def __init__(self, vocabulary_size: int, units: int, name: str = 'unnamed', dtype=None):
+        super().__init__(name)
+        self.dtype = dtype
+
+        self._E = xp.random.normal(scale=0.1, size=(vocabulary_size, units)).astype(self.dtype)
+        self._dEdE = xp.zeros_like(self._E)
+        self._dEdE_sparse = SparseGradient(axis=0)
+
+    @property
+    def parameters(self) -> tuple:
+        return self._E,
+
+    @parameters.setter
+    def parameters(self, val: tuple):
+        self._E, = val
+
+    def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
+        out = self._buffer('out', inputs.shape + self._E.shape[1:], self._E.dtype)
+        return xp.take(self._E, inputs, axis=0, out=out)
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        rows, occurrences = xp.unique(self._inputs, return_inverse=True)
+        values = xp.zeros((len(rows), self._E.shape[1]), dtype=xp.result_type(dEdO, self._E))
+        xp.add.at(values, occurrences.reshape(-1), dEdO.reshape(-1, self._E.shape[1]))
+        self._dEdE_sparse.scatter(self._dEdE, rows, values)
+        return None
@@ -0,0 +1,19 @@
+from backend.backend import xp
+from layers.function import Function
+
+
+class Flatten(Function):
+    """
+    Reshapes inputs of shape Nb × d1 × d2 × ... into Nb × (d1·d2·...), for example the feature maps of a convolutional
+    layer into the inputs of a DenseLayer. Contiguous inputs are reshaped without a copy, and backward reshapes the
+    gradient back to the shape of the inputs.
+    """
+
+    def __init__(self, name: str = 'Flatten'):
+        super().__init__(name)
+
+    def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
+        return inputs.reshape(inputs.shape[0], -1)
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        return dEdO.reshape(self._inputs.shape)
@@ -1,4 +1,5 @@
-from backend.backend import xp
+from backend.backend import xp, floatx
+from backend.workspace import Workspace
 from abc import ABC, abstractmethod
 
 
@@ -14,12 +15,22 @@ class Function(ABC):
     We focus on simple, sequential neural networks where each layer has one input and one output. Each function stores its
     input and the gradient with respect to that input, and forward propagation writes results into a provided tensor. In
     older versions this class was called `AbstractLayer`; now the equivalent is `Function`.
+
+    The reused memory comes from a Workspace (see backend/workspace.py) that the Model attaches to each of its layers. While
+    training, `_buffer` hands out the persistent buffers of the workspace; a function without a workspace, or one that is
+    not training, allocates fresh arrays, so results returned during inference are never overwritten by a later call.
+
+    The floating point type of parameters and outputs is given by `dtype`, which follows backend.floatx() unless it is set
+    explicitly, for example by the Model that the function belongs to.
     """
 
     def __init__(self, name: str = 'unnamed'):
         self._training = True
         self._inputs: xp.ndarray = None  # remembering last inout
         self.name = name
+        self._workspace: Workspace = None
+        self._dtype = None
+        self._recomputing = False  # set while a checkpointed Model repeats the forward pass of a training step
 
     @abstractmethod
     def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
@@ -33,6 +44,30 @@ class Function(ABC):
     def training(self, val: bool):
         self._training = val
 
+    @property
+    def dtype(self):
+        return self._dtype if self._dtype is not None else floatx()
+
+    @dtype.setter
+    def dtype(self, val):
+        self._dtype = None if val is None else xp.dtype(val)
+
+    @property
+    def workspace(self) -> Workspace:
+        return self._workspace
+
+    @workspace.setter
+    def workspace(self, val: Workspace):
+        self._workspace = val
+
+    def _buffer(self, tag: str, shape: tuple, dtype=float) -> xp.ndarray:
+        """
+        Returns an uninitialized array to be used as an `out` parameter. Arrays with the same tag share memory between calls.
+        """
+        if self._workspace is None or not self._training:
+            return xp.empty(shape, dtype=dtype)
+        return self._workspace.get(self, tag, shape, dtype)
+
     @property
     def parameters(self) -> tuple:
         return tuple()
@@ -54,6 +89,13 @@ class Function(ABC):
         if self._training:
             self._inputs = inputs
 
+    def release(self):
+        """
+        Drops the tensors retained for backward propagation, so their memory can be freed before the next forward pass.
+        Layers that retain more than their inputs extend this.
+        """
+        self._inputs = None
+
     @abstractmethod
     def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
         """
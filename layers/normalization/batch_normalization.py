@@ -3,6 +3,17 @@ from backend.backend import xp
 
 
 class BatchNormalization(AdaptiveObject):
+    """
+    Batch normalization standardizes every feature with the mean and variance of the current minibatch,
+    x_hat = (x − μ_B) / sqrt(σ²_B + eps), and outputs γ x_hat + β. Running averages of μ_B and σ²_B are used at inference.
+
+    With g = dE/dO, the gradient with respect to the inputs is dE/dx = γ / sqrt(σ²_B + eps) · (g − mean(g) − x_hat ·
+    mean(g · x_hat)), where the means are taken over the batch. The standard deviation computed in the forward pass is
+    kept and reused, and every batch-sized intermediate is written into a workspace buffer.
+    """
+
+    _trainable = (('gamma', 'd_gamma'), ('beta', 'd_beta'))
+    _state = ('mean', 'var', 'batch_mean', 'batch_var', '_std')
 
     def __init__(self, alpha: float = 0.99, name: str = 'Batch normalization layer'):
         super().__init__(name)
@@ -17,6 +28,8 @@ class BatchNormalization(AdaptiveObject):
         self.d_beta = None
         self.x_hat = None
         self.alpha = alpha
+        self.eps = 10e-4
+        self._std = None
 
     @property
     def parameters(self) -> tuple:
@@ -31,49 +44,65 @@ class BatchNormalization(AdaptiveObject):
         if self.mean is None:
             shape = list(inputs.shape)
             shape[0] = 1
-            self.mean = xp.zeros(shape, dtype=float)
-            self.var = xp.zeros(shape, dtype=float)
-            self.gamma = xp.ones(shape, dtype=float)
-            self.beta = xp.zeros(shape, dtype=float)
+            self.mean = xp.zeros(shape, dtype=self.dtype)
+            self.var = xp.zeros(shape, dtype=self.dtype)
+            self.gamma = xp.ones(shape, dtype=self.dtype)
+            self.beta = xp.zeros(shape, dtype=self.dtype)
+        if self.d_gamma is None:
+            self.batch_mean = xp.zeros_like(self.mean)
+            self.batch_var = xp.zeros_like(self.var)
+            self._std = xp.zeros_like(self.var)
+            self.d_gamma = xp.zeros_like(self.gamma)
+            self.d_beta = xp.zeros_like(self.beta)
 
     def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
+        out = self._buffer('out', inputs.shape, self.gamma.dtype)
         if not self._training:
-            return self.gamma * (inputs - self.mean) \
-                   / xp.sqrt(self.var + 10e-4) + self.beta
-        else:
-            self.batch_mean = xp.mean(inputs, axis=0, keepdims=True)
-            self.batch_var = xp.var(inputs, axis=0, keepdims=True)
-
-            self.mean = self.alpha * self.mean + (1 - self.alpha) * self.batch_mean
-            self.var = self.alpha * self.var + (1 - self.alpha) * self.batch_var
-
-            self.x_hat = (inputs - self.batch_mean) / xp.sqrt(self.batch_var + 10e-4)
-
-            return self.gamma * self.x_hat + self.beta
+            scale = self.gamma / xp.sqrt(self.var + self.eps)
+            xp.subtract(inputs, self.mean, out=out)
+            out *= scale
+            out += self.beta
+            return out
+
+        # the variance is the mean of the squared centred inputs, squared in the output buffer, as xp.var would
+        # allocate a temporary array of the size of the inputs
+        self.x_hat = self._buffer('x_hat', inputs.shape, out.dtype)
+        xp.mean(inputs, axis=0, keepdims=True, out=self.batch_mean)
+        xp.subtract(inputs, self.batch_mean, out=self.x_hat)
+        xp.multiply(self.x_hat, self.x_hat, out=out)
+        xp.mean(out, axis=0, keepdims=True, out=self.batch_var)
+
+        if not self._recomputing:  # the statistics of this batch were already added by the first forward pass
+            self.mean *= self.alpha
+            self.mean += (1 - self.alpha) * self.batch_mean
+            self.var *= self.alpha
+            self.var += (1 - self.alpha) * self.batch_var
+
+        xp.add(self.batch_var, self.eps, out=self._std)
+        xp.sqrt(self._std, out=self._std)
+
+        self.x_hat /= self._std
+
+        xp.multiply(self.x_hat, self.gamma, out=out)
+        out += self.beta
+        return out
+
+    def release(self):
+        super().release()
+        self.x_hat = None
 
     def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
         Nb = self._inputs.shape[0]
 
-        self.d_beta = dEdO.sum(axis=0, keepdims=True)
-        self.d_gamma = xp.sum(self.x_hat * dEdO, axis=0, keepdims=True)
+        dEdI = self._buffer('dEdI', dEdO.shape, xp.result_type(dEdO, self.x_hat))
+        xp.sum(dEdO, axis=0, keepdims=True, out=self.d_beta)
+        xp.multiply(self.x_hat, dEdO, out=dEdI)
+        xp.sum(dEdI, axis=0, keepdims=True, out=self.d_gamma)
 
-        _tmp_array = xp.add(self.batch_var, 1e-4)
-        xp.sqrt(_tmp_array, out=_tmp_array)
-        var_sqrt = xp.sqrt(self.batch_var + 1e-4)
-
-        s1 = self.gamma * dEdO / var_sqrt
-        s2 = (dEdO * self.x_hat).sum(axis=0, keepdims=True) * \
-             self.x_hat.sum(axis=0, keepdims=True) * \
-             self.gamma / (Nb * Nb * var_sqrt)
-        s3 = - 1 / Nb * self.gamma / var_sqrt * dEdO.sum(axis=0, keepdims=True)
-        s4 = - 1 / Nb * self.x_hat * self.gamma / var_sqrt * \
-             xp.sum(self.x_hat * dEdO, axis=0, keepdims=True)
-
-        return s1 + s2 + s3 + s4
-
-    def update_parameters(self):
-        self._optimizer.update_parameters(self.gamma, self.d_gamma)
-        self._optimizer.update_parameters(self.beta, self.d_beta)
-        self.d_beta = None
-        self.d_gamma = None
+        # the term proportional to sum(x_hat) vanishes, since x_hat has zero mean over the batch
+        xp.multiply(self.x_hat, self.d_gamma / Nb, out=dEdI)
+        dEdI += self.d_beta / Nb
+        xp.subtract(dEdO, dEdI, out=dEdI)
+        dEdI *= self.gamma / self._std
 
+        return dEdI
@@ -3,6 +3,17 @@ from backend.backend import xp
 
 
 class LayerNormalization(AdaptiveObject):
+    """
+    Layer normalization standardizes every sample with the mean and variance of its own features,
+    x_hat = (x − μ) / sqrt(σ² + eps), and outputs γ x_hat + β. The statistics do not depend on the rest of the batch, so
+    the same computation is used for training and inference.
+
+    With g = γ · dE/dO, the gradient with respect to the inputs is dE/dx = (g − mean(g) − x_hat · mean(g · x_hat)) /
+    sqrt(σ² + eps), where the means are taken over the features. Every batch-sized intermediate is written into a
+    workspace buffer.
+    """
+
+    _trainable = (('gamma', 'd_gamma'), ('beta', 'd_beta'))
 
     def __init__(self, name: str = 'Layer normalization layer'):
         super().__init__(name)
@@ -13,8 +24,9 @@ class LayerNormalization(AdaptiveObject):
         self.d_gamma = None
         self.beta = None
         self.d_beta = None
-        self._tmp_array = None
         self.x_hat = None
+        self.eps = 10e-4
+        self._std = None
 
     @property
     def parameters(self) -> tuple:
@@ -30,36 +42,60 @@ class LayerNormalization(AdaptiveObject):
             shape = list(inputs.shape)
             shape[0] = 1
             shape = tuple(shape)
-            self.gamma = xp.ones(shape, dtype=float)
-            self.beta = xp.zeros(shape, dtype=float)
+            self.gamma = xp.ones(shape, dtype=self.dtype)
+            self.beta = xp.zeros(shape, dtype=self.dtype)
+        if self.d_gamma is None:
+            self.d_gamma = xp.zeros_like(self.gamma)
+            self.d_beta = xp.zeros_like(self.beta)
 
     def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
-        self.mean = xp.mean(inputs, axis=-1, keepdims=True)
-        self.var = xp.var(inputs, axis=-1, keepdims=True)
-        self.x_hat = (inputs - self.mean) / xp.sqrt(self.var + 10e-4)
-
-        return self.gamma * self.x_hat + self.beta
+        dtype = self.gamma.dtype
+        stats_shape = inputs.shape[:-1] + (1,)
+
+        self.mean = self._buffer('mean', stats_shape, dtype)
+        self.var = self._buffer('var', stats_shape, dtype)
+        self._std = self._buffer('std', stats_shape, dtype)
+        self.x_hat = self._buffer('x_hat', inputs.shape, dtype)
+        out = self._buffer('out', inputs.shape, dtype)
+
+        # the variance is the mean of the squared centred inputs, squared in the output buffer, as xp.var would
+        # allocate a temporary array of the size of the inputs
+        xp.mean(inputs, axis=-1, keepdims=True, out=self.mean)
+        xp.subtract(inputs, self.mean, out=self.x_hat)
+        xp.multiply(self.x_hat, self.x_hat, out=out)
+        xp.mean(out, axis=-1, keepdims=True, out=self.var)
+        xp.add(self.var, self.eps, out=self._std)
+        xp.sqrt(self._std, out=self._std)
+        self.x_hat /= self._std
+
+        xp.multiply(self.x_hat, self.gamma, out=out)
+        out += self.beta
+        return out
+
+    def release(self):
+        super().release()
+        self.x_hat = None
 
     def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
-
-        self.d_beta = dEdO.sum(axis=0, keepdims=True)
-        self.d_gamma = xp.sum(self.x_hat * dEdO, axis=0,
-                              keepdims=True)
-
-        var_sqrt = xp.sqrt(self.var + 10e-4)
-
-        dX = xp.zeros_like(self._inputs)
-        d = dX.shape[1]
-
-        s1 = dEdO * self.gamma / var_sqrt
-        s2 = (self.gamma * self.x_hat * dEdO).sum(axis=1, keepdims=True) * self.x_hat.sum(axis=1, keepdims=True) / (d*d * var_sqrt)
-        s3 = -(dEdO * self.gamma).sum(axis=1, keepdims=True)/(d*var_sqrt)
-        s4 = -(self.gamma * self.x_hat * dEdO).sum(1, keepdims=True) * self.x_hat/(var_sqrt * d)
-
-        return s1 + s2 + s3 + s4
-
-    def update_parameters(self):
-        self._optimizer.update_parameters(self.gamma, self.d_gamma)
-        self._optimizer.update_parameters(self.beta, self.d_beta)
-        self.d_beta = None
-        self.d_gamma = None
+        dtype = xp.result_type(dEdO, self.x_hat)
+        g = self._buffer('g', dEdO.shape, dtype)
+        dEdI = self._buffer('dEdI', dEdO.shape, dtype)
+        mean_g = self._buffer('mean_g', self._std.shape, dtype)
+        mean_g_x_hat = self._buffer('mean_g_x_hat', self._std.shape, dtype)
+
+        xp.sum(dEdO, axis=0, keepdims=True, out=self.d_beta)
+        xp.multiply(self.x_hat, dEdO, out=g)
+        xp.sum(g, axis=0, keepdims=True, out=self.d_gamma)
+
+        xp.multiply(dEdO, self.gamma, out=g)
+        xp.mean(g, axis=-1, keepdims=True, out=mean_g)
+        xp.multiply(g, self.x_hat, out=dEdI)
+        xp.mean(dEdI, axis=-1, keepdims=True, out=mean_g_x_hat)
+
+        # the term proportional to sum(x_hat) vanishes, since x_hat has zero mean over the features
+        xp.multiply(self.x_hat, mean_g_x_hat, out=dEdI)
+        xp.subtract(g, dEdI, out=dEdI)
+        dEdI -= mean_g
+        dEdI /= self._std
+
+        return dEdI
@@ -0,0 +1,107 @@
+from backend.backend import xp
+from layers.recurrent.recurrent_layer import RecurrentLayer, sigmoid
+
+
+class GRU(RecurrentLayer):
+    """
+    Gated recurrent unit. The three gates are fused in the order reset, update, candidate:
+
+    r = σ(x_r + h_r), u = σ(x_u + h_u), n = tanh(x_n + r · h_n),
+    h_t = (1 − u) · n + u · h_{t−1},
+
+    where x = W_x x_t + b is the input projection and h = W_h h_{t−1} + b_h the recurrent projection, which has a bias
+    of its own because the reset gate scales it. Since r only scales h_n, the gradients of the two projections differ
+    in the candidate part, and backward keeps a second buffer for the latter.
+    """
+
+    _trainable = RecurrentLayer._trainable + (('_b_h', '_dEdb_h'), )
+    _gates = 3
+
+    def __init__(self, input_units: int, hidden_units: int, return_sequences: bool = True, truncate: int = None,
+                 weight_init_method: str = 'xavier_uniform', name: str = 'unnamed', dtype=None):
+        super().__init__(input_units, hidden_units, return_sequences, truncate, weight_init_method, name, dtype)
+        self._b_h = xp.zeros_like(self._b)
+        self._dEdb_h = xp.zeros_like(self._b)
+
+        self._activations: xp.ndarray = None
+        self._candidate_recurrent: xp.ndarray = None  # h_n of every timestep
+        self._tmp: xp.ndarray = None
+
+    @property
+    def parameters(self) -> tuple:
+        return self._W_x, self._W_h, self._b, self._b_h
+
+    @parameters.setter
+    def parameters(self, val: tuple):
+        self._W_x, self._W_h, self._b, self._b_h = val
+
+    def _begin(self, steps: int, n: int):
+        units = self.hidden_units
+        dtype = self._W_x.dtype
+        self._activations = self._buffer('activations', (steps, n, 3 * units), dtype)
+        self._candidate_recurrent = self._buffer('candidate_recurrent', (steps, n, units), dtype)
+
+    def _step(self, t: int, projection: xp.ndarray, recurrent: xp.ndarray, h_prev: xp.ndarray, h: xp.ndarray):
+        units = self.hidden_units
+        a = self._activations[t]
+        recurrent += self._b_h
+        xp.add(projection[:, :2 * units], recurrent[:, :2 * units], out=a[:, :2 * units])
+        sigmoid(a[:, :2 * units], out=a[:, :2 * units])
+        r, u, n = a[:, :units], a[:, units: 2 * units], a[:, 2 * units:]
+
+        h_n = self._candidate_recurrent[t]
+        h_n[...] = recurrent[:, 2 * units:]
+        xp.multiply(r, h_n, out=n)
+        n += projection[:, 2 * units:]
+        xp.tanh(n, out=n)
+
+        # h_t = n + u · (h_{t−1} − n)
+        xp.subtract(h_prev, n, out=h)
+        h *= u
+        h += n
+
+    def release(self):
+        super().release()
+        self._activations = None
+        self._candidate_recurrent = None
+
+    def _recurrent_gradients(self, dEdZ: xp.ndarray) -> xp.ndarray:
+        return self._buffer('dEdZ_h', dEdZ.shape, dEdZ.dtype)
+
+    def _begin_backward(self, n: int, dtype):
+        self._tmp = self._buffer('tmp', (n, self.hidden_units), dtype)
+
+    def _step_backward(self, t: int, dEdH: xp.ndarray, dEdZ: xp.ndarray, dEdZ_h: xp.ndarray):
+        units = self.hidden_units
+        a = self._activations[t]
+        r, u, n = a[:, :units], a[:, units: 2 * units], a[:, 2 * units:]
+        h_n, tmp = self._candidate_recurrent[t], self._tmp
+        dEdZ_r, dEdZ_u, dEdZ_n = dEdZ[:, :units], dEdZ[:, units: 2 * units], dEdZ[:, 2 * units:]
+
+        # dE/dz_n = dE/dh_t · (1 − u) · (1 − n²)
+        xp.multiply(n, n, out=dEdZ_n)
+        xp.subtract(1, dEdZ_n, out=dEdZ_n)
+        xp.subtract(1, u, out=tmp)
+        dEdZ_n *= tmp
+        dEdZ_n *= dEdH
+        # dE/dz_u = dE/dh_t · (h_{t−1} − n) · u · (1 − u)
+        xp.subtract(self._hidden[t], n, out=dEdZ_u)
+        dEdZ_u *= dEdH
+        tmp *= u
+        dEdZ_u *= tmp
+        # dE/dz_r = dE/dz_n · h_n · r · (1 − r)
+        xp.multiply(dEdZ_n, h_n, out=dEdZ_r)
+        xp.subtract(1, r, out=tmp)
+        tmp *= r
+        dEdZ_r *= tmp
+
+        dEdZ_h[:, :2 * units] = dEdZ[:, :2 * units]
+        xp.multiply(dEdZ_n, r, out=dEdZ_h[:, 2 * units:])
+
+    def _add_direct_gradient(self, t: int, dEdH: xp.ndarray, dEdH_prev: xp.ndarray):
+        units = self.hidden_units
+        xp.multiply(dEdH, self._activations[t][:, units: 2 * units], out=self._tmp)
+        dEdH_prev += self._tmp
+
+    def _finish_backward(self, dEdZ_h: xp.ndarray):
+        xp.sum(dEdZ_h.reshape(-1, dEdZ_h.shape[-1]), axis=0, out=self._dEdb_h)
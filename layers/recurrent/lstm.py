@@ -0,0 +1,107 @@
+from backend.backend import xp
+from layers.recurrent.recurrent_layer import RecurrentLayer, sigmoid
+
+
+class LSTM(RecurrentLayer):
+    """
+    Long short-term memory. The four gates are fused in the order input, forget, candidate, output:
+
+    i, f, o = σ(z_i), σ(z_f), σ(z_o), g = tanh(z_g), where z = W_x x_t + W_h h_{t−1} + b,
+    c_t = f · c_{t−1} + i · g,
+    h_t = o · tanh(c_t).
+
+    The gate activations, the cell states and tanh(c_t) of every timestep are kept for backward, which propagates the
+    gradient of the cell state along with that of the hidden state. The biases of the forget gate start at 1, so the
+    cell state is remembered by default at the beginning of training.
+    """
+
+    _gates = 4
+
+    def __init__(self, input_units: int, hidden_units: int, return_sequences: bool = True, truncate: int = None,
+                 weight_init_method: str = 'xavier_uniform', name: str = 'unnamed', dtype=None):
+        super().__init__(input_units, hidden_units, return_sequences, truncate, weight_init_method, name, dtype)
+        self._b[hidden_units: 2 * hidden_units] = 1
+
+        self._activations: xp.ndarray = None
+        self._cells: xp.ndarray = None
+        self._tanh_cells: xp.ndarray = None
+        self._dEdC: xp.ndarray = None
+        self._dEdC_prev: xp.ndarray = None
+        self._tmp: xp.ndarray = None
+
+    def _begin(self, steps: int, n: int):
+        units = self.hidden_units
+        dtype = self._W_x.dtype
+        self._activations = self._buffer('activations', (steps, n, 4 * units), dtype)
+        self._cells = self._buffer('cells', (steps + 1, n, units), dtype)
+        self._tanh_cells = self._buffer('tanh_cells', (steps, n, units), dtype)
+        self._cells[0] = 0
+
+    def _step(self, t: int, projection: xp.ndarray, recurrent: xp.ndarray, h_prev: xp.ndarray, h: xp.ndarray):
+        units = self.hidden_units
+        a = self._activations[t]
+        xp.add(projection, recurrent, out=a)
+        sigmoid(a[:, :2 * units], out=a[:, :2 * units])
+        xp.tanh(a[:, 2 * units: 3 * units], out=a[:, 2 * units: 3 * units])
+        sigmoid(a[:, 3 * units:], out=a[:, 3 * units:])
+        i, f, g, o = a[:, :units], a[:, units: 2 * units], a[:, 2 * units: 3 * units], a[:, 3 * units:]
+
+        c, tanh_c = self._cells[t + 1], self._tanh_cells[t]
+        xp.multiply(f, self._cells[t], out=c)
+        xp.multiply(i, g, out=tanh_c)
+        c += tanh_c
+        xp.tanh(c, out=tanh_c)
+        xp.multiply(o, tanh_c, out=h)
+
+    def release(self):
+        super().release()
+        self._activations = None
+        self._cells = None
+        self._tanh_cells = None
+
+    def _begin_backward(self, n: int, dtype):
+        self._dEdC = self._buffer('dEdC', (n, self.hidden_units), dtype)
+        self._dEdC_prev = self._buffer('dEdC_prev', (n, self.hidden_units), dtype)
+        self._tmp = self._buffer('tmp', (n, self.hidden_units), dtype)
+        self._dEdC_prev.fill(0)
+
+    def _truncate(self):
+        self._dEdC_prev.fill(0)
+
+    def _step_backward(self, t: int, dEdH: xp.ndarray, dEdZ: xp.ndarray, dEdZ_h: xp.ndarray):
+        units = self.hidden_units
+        a = self._activations[t]
+        i, f, g, o = a[:, :units], a[:, units: 2 * units], a[:, 2 * units: 3 * units], a[:, 3 * units:]
+        tanh_c, dEdC, tmp = self._tanh_cells[t], self._dEdC, self._tmp
+        dEdZ_i, dEdZ_f = dEdZ[:, :units], dEdZ[:, units: 2 * units]
+        dEdZ_g, dEdZ_o = dEdZ[:, 2 * units: 3 * units], dEdZ[:, 3 * units:]
+
+        # dE/dc_t = dE/dc_{t+1} · f_{t+1} + dE/dh_t · o · (1 − tanh²(c_t))
+        xp.multiply(tanh_c, tanh_c, out=dEdC)
+        xp.subtract(1, dEdC, out=dEdC)
+        dEdC *= o
+        dEdC *= dEdH
+        dEdC += self._dEdC_prev
+
+        # dE/dz_o = dE/dh_t · tanh(c_t) · o · (1 − o)
+        xp.multiply(dEdH, tanh_c, out=dEdZ_o)
+        xp.subtract(1, o, out=tmp)
+        tmp *= o
+        dEdZ_o *= tmp
+        # dE/dz_i = dE/dc_t · g · i · (1 − i)
+        xp.multiply(dEdC, g, out=dEdZ_i)
+        xp.subtract(1, i, out=tmp)
+        tmp *= i
+        dEdZ_i *= tmp
+        # dE/dz_f = dE/dc_t · c_{t−1} · f · (1 − f)
+        xp.multiply(dEdC, self._cells[t], out=dEdZ_f)
+        xp.subtract(1, f, out=tmp)
+        tmp *= f
+        dEdZ_f *= tmp
+        # dE/dz_g = dE/dc_t · i · (1 − g²)
+        xp.multiply(g, g, out=tmp)
+        xp.subtract(1, tmp, out=tmp)
+        tmp *= i
+        xp.multiply(dEdC, tmp, out=dEdZ_g)
+
+        xp.multiply(dEdC, f, out=self._dEdC_prev)
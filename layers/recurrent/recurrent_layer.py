@@ -0,0 +1,187 @@
+from abc import abstractmethod
+
+from backend.backend import xp
+from models.adaptive_object import AdaptiveObject
+from weight_initializers.random_initialize import rand_init
+
+
+class RecurrentLayer(AdaptiveObject):
+    """
+    Base class of the recurrent layers. Inputs have the shape Nb × T × n_in and the outputs are the hidden states of all
+    timesteps, Nb × T × n, or only the last one, Nb × n, with return_sequences=False. The initial hidden state is zero.
+
+    Every cell has `_gates` gates (1 for RNN, 4 for LSTM, 3 for GRU) whose pre-activations are the sum of an input
+    projection W_x x_t + b and a recurrent projection W_h h_{t−1}. The gate weights are fused into one matrix per
+    projection, so each projection is a single matrix product for all gates. The input projection does not depend on the
+    recurrence, so it is computed for all timesteps with one matrix product before the loop over time, leaving one
+    Nb × n by n × gates·n product per timestep inside it.
+
+    backward implements backpropagation through time. The per-timestep states of the forward pass (hidden states, gate
+    activations, cell states) are kept in preallocated time-major buffers of the workspace, and the loop over time
+    only computes the gradients of the pre-activations of every timestep; the weight gradients and the gradient of the
+    inputs then follow from three matrix products over all timesteps at once. With truncate=k, the gradient is not
+    propagated between consecutive chunks of k timesteps (truncated BPTT), while the forward pass still runs over the
+    whole sequence.
+
+    Subclasses implement _step and _step_backward for one timestep.
+    """
+
+    _trainable = (('_W_x', '_dEdW_x'), ('_W_h', '_dEdW_h'), ('_b', '_dEdb'))
+    _gates = 1
+
+    def __init__(self, input_units: int, hidden_units: int, return_sequences: bool = True, truncate: int = None,
+                 weight_init_method: str = 'xavier_uniform', name: str = 'unnamed', dtype=None):
+        super().__init__(name)
+        self.dtype = dtype
+        self.hidden_units = hidden_units
+        self.return_sequences = return_sequences
+        self.truncate = truncate
+
+        units = self._gates * hidden_units
+        self._W_x = rand_init(units, input_units, init_mode=weight_init_method, dtype=self.dtype)
+        self._W_h = rand_init(units, hidden_units, init_mode=weight_init_method, dtype=self.dtype)
+        self._b = xp.zeros((units, ), dtype=self.dtype)
+        self._dEdW_x = xp.zeros_like(self._W_x)
+        self._dEdW_h = xp.zeros_like(self._W_h)
+        self._dEdb = xp.zeros_like(self._b)
+
+        self._x: xp.ndarray = None  # the inputs, time-major
+        self._hidden: xp.ndarray = None  # h_0, ..., h_T, time-major
+
+    @property
+    def parameters(self) -> tuple:
+        return self._W_x, self._W_h, self._b
+
+    @parameters.setter
+    def parameters(self, val: tuple):
+        self._W_x, self._W_h, self._b = val
+
+    def __call__(self, inputs: xp.ndarray) -> xp.ndarray:
+        n, steps, input_units = inputs.shape
+        units = self._b.shape[0]
+        dtype = self._W_x.dtype
+
+        x = self._buffer('x', (steps, n, input_units), dtype)
+        x[...] = inputs.transpose(1, 0, 2)
+        projection = self._buffer('projection', (steps, n, units), dtype)
+        xp.matmul(x.reshape(steps * n, input_units), self._W_x.T, out=projection.reshape(steps * n, units))
+        projection += self._b
+
+        hidden = self._buffer('hidden', (steps + 1, n, self.hidden_units), dtype)
+        hidden[0] = 0
+        recurrent = self._buffer('recurrent', (n, units), dtype)
+        self._begin(steps, n)
+        for t in range(steps):
+            xp.matmul(hidden[t], self._W_h.T, out=recurrent)
+            self._step(t, projection[t], recurrent, hidden[t], hidden[t + 1])
+
+        if self._training:
+            self._x = x
+            self._hidden = hidden
+
+        if not self.return_sequences:
+            out = self._buffer('out', (n, self.hidden_units), dtype)
+            out[...] = hidden[steps]
+            return out
+        out = self._buffer('out', (n, steps, self.hidden_units), dtype)
+        out[...] = hidden[1:].transpose(1, 0, 2)
+        return out
+
+    def release(self):
+        super().release()
+        self._x = None
+        self._hidden = None
+
+    def backward(self, dEdO: xp.ndarray) -> xp.ndarray:
+        steps, n, input_units = self._x.shape
+        units = self._b.shape[0]
+        dtype = xp.result_type(dEdO, self._W_x)
+
+        dEdH = self._buffer('dEdH', (steps, n, self.hidden_units), dtype)
+        if self.return_sequences:
+            dEdH[...] = dEdO.transpose(1, 0, 2)
+        else:
+            dEdH[:-1] = 0
+            dEdH[-1] = dEdO
+
+        dEdZ = self._buffer('dEdZ', (steps, n, units), dtype)  # gradients of the pre-activations
+        dEdZ_h = self._recurrent_gradients(dEdZ)
+        dEdH_prev = self._buffer('dEdH_prev', (n, self.hidden_units), dtype)
+        dEdH_prev.fill(0)
+        self._begin_backward(n, dtype)
+        for t in reversed(range(steps)):
+            if self.truncate and (t + 1) % self.truncate == 0 and t + 1 < steps:
+                dEdH_prev.fill(0)  # timestep t + 1 starts a new chunk
+                self._truncate()
+            dEdH_t = dEdH[t]
+            dEdH_t += dEdH_prev
+            self._step_backward(t, dEdH_t, dEdZ[t], dEdZ_h[t])
+            xp.matmul(dEdZ_h[t], self._W_h, out=dEdH_prev)
+            self._add_direct_gradient(t, dEdH_t, dEdH_prev)
+
+        dEdZ_2d = dEdZ.reshape(steps * n, units)
+        xp.matmul(dEdZ_2d.T, self._x.reshape(steps * n, input_units), out=self._dEdW_x)
+        xp.sum(dEdZ_2d, axis=0, out=self._dEdb)
+        xp.matmul(dEdZ_h.reshape(steps * n, units).T, self._hidden[:-1].reshape(steps * n, self.hidden_units),
+                  out=self._dEdW_h)
+        self._finish_backward(dEdZ_h)
+
+        dEdX = self._buffer('dEdX', (steps, n, input_units), dtype)
+        xp.matmul(dEdZ_2d, self._W_x, out=dEdX.reshape(steps * n, input_units))
+        dEdI = self._buffer('dEdI', (n, steps, input_units), dtype)
+        dEdI[...] = dEdX.transpose(1, 0, 2)
+        return dEdI
+
+    def _begin(self, steps: int, n: int):
+        """
+        Prepares the buffers for the states of a forward pass of steps timesteps.
+        """
+        pass
+
+    @abstractmethod
+    def _step(self, t: int, projection: xp.ndarray, recurrent: xp.ndarray, h_prev: xp.ndarray, h: xp.ndarray):
+        """
+        Computes the hidden state h of timestep t from the input projection W_x x_t + b and the recurrent projection
+        W_h h_{t−1} of all gates (both Nb × gates·n, the latter may be overwritten).
+        """
+        pass
+
+    def _begin_backward(self, n: int, dtype):
+        pass
+
+    @abstractmethod
+    def _step_backward(self, t: int, dEdH: xp.ndarray, dEdZ: xp.ndarray, dEdZ_h: xp.ndarray):
+        """
+        Writes the gradients of the pre-activations of timestep t into dEdZ, given dEdH, the gradient of its hidden
+        state. dEdZ_h receives the gradient of the recurrent projection, if it differs from dEdZ.
+        """
+        pass
+
+    def _recurrent_gradients(self, dEdZ: xp.ndarray) -> xp.ndarray:
+        """
+        The buffer of the gradients of the recurrent projections, which are those of the pre-activations unless the
+        cell treats the recurrent projection differently (GRU).
+        """
+        return dEdZ
+
+    def _add_direct_gradient(self, t: int, dEdH: xp.ndarray, dEdH_prev: xp.ndarray):
+        """
+        Adds the part of the gradient of h_{t−1} that does not pass through the recurrent projection.
+        """
+        pass
+
+    def _truncate(self):
+        """
+        Stops the gradient of any state other than the hidden state that is carried between timesteps.
+        """
+        pass
+
+    def _finish_backward(self, dEdZ_h: xp.ndarray):
+        pass
+
+
+def sigmoid(x: xp.ndarray, out: xp.ndarray) -> xp.ndarray:
+    xp.negative(x, out=out)
+    xp.exp(out, out=out)
+    out += 1
+    return xp.reciprocal(out, out=out)
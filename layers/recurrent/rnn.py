@@ -0,0 +1,19 @@
+from backend.backend import xp
+from layers.recurrent.recurrent_layer import RecurrentLayer
+
+
+class RNN(RecurrentLayer):
+    """
+    The simple (Elman) recurrent layer h_t = tanh(W_x x_t + W_h h_{t−1} + b). Backward only needs the hidden states:
+    dE/dz_t = dE/dh_t · (1 − h_t²).
+    """
+
+    def _step(self, t: int, projection: xp.ndarray, recurrent: xp.ndarray, h_prev: xp.ndarray, h: xp.ndarray):
+        xp.add(projection, recurrent, out=h)
+        xp.tanh(h, out=h)
+
+    def _step_backward(self, t: int, dEdH: xp.ndarray, dEdZ: xp.ndarray, dEdZ_h: xp.ndarray):
+        h = self._hidden[t + 1]
+        xp.multiply(h, h, out=dEdZ)
+        xp.subtract(1, dEdZ, out=dEdZ)
+        dEdZ *= dEdH
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from typing import Tuple
 
 from backend.backend import xp
 from layers.function import Function
@@ -27,3 +28,11 @@ class LossFunction(Function):
         The result of this call is the set of partial derivatives dE/dy.
         """
         pass
+
+    def value_and_grad(self, y: xp.ndarray, t: xp.ndarray) -> Tuple[float, xp.ndarray]:
+        """
+        Returns the value of the error function and the partial derivatives dE/dy. During training both are needed for
+        every minibatch, and most losses share intermediate results between the two (for example the log-probabilities),
+        so subclasses override this method to compute them in a single pass.
+        """
+        return self(y, t), self.backward(y, t)
@@ -1,10 +1,21 @@
+from typing import Tuple
+
 from backend.backend import xp
 
-from layers.activation_functions.sigmoid import Sigmoid
 from loss_functions.abstract_loss_function import LossFunction
 
 
 class BinaryCrossEntropy(LossFunction):
+    """
+    E = −mean(t log(y) + (1 − t) log(1 − y)).
+
+    With from_logits=True the inputs are logits z and y = s(z) = 1 / (1 + exp(−z)). Since log s(z) = −softplus(−z) and
+    log(1 − s(z)) = −softplus(z), the loss becomes E = mean(softplus(z) − t z), and the gradient is (s(z) − t) / Nb.
+    Both are evaluated from e = exp(−|z|), which never overflows:
+
+    softplus(z) = max(z, 0) + log(1 + e),
+    s(z) = 1 / (1 + e) for z ≥ 0 and e / (1 + e) for z < 0.
+    """
 
     def __init__(self, from_logits: bool = False):
         super().__init__('BinaryCrosseEntropyLoss')
@@ -12,15 +23,40 @@ class BinaryCrossEntropy(LossFunction):
 
     def __call__(self, y: xp.ndarray, t: xp.ndarray):
         if self.from_logits:
-            y = Sigmoid()(y)
+            return self._value(y, t, self._exp_neg_abs(y))
 
         return -xp.mean(t * xp.log(y) + (1 - t) * xp.log(1 - y))
 
     def backward(self, y: xp.ndarray, t: xp.ndarray) -> xp.ndarray:
         if self.from_logits:
-            y = Sigmoid()(y)
-            return (y - t) / y.shape[0]
+            return self._grad(y, t, self._exp_neg_abs(y))
         return (y - t) / (y * (1 - y) * y.shape[0])
 
-
-
+    def value_and_grad(self, y: xp.ndarray, t: xp.ndarray) -> Tuple[float, xp.ndarray]:
+        if not self.from_logits:
+            return super().value_and_grad(y, t)
+
+        e = self._exp_neg_abs(y)
+        value = self._value(y, t, e)
+        return value, self._grad(y, t, e)
+
+    def _exp_neg_abs(self, z: xp.ndarray) -> xp.ndarray:
+        e = self._buffer('exp_neg_abs', z.shape, xp.result_type(z, 1.0))
+        xp.abs(z, out=e)
+        xp.negative(e, out=e)
+        return xp.exp(e, out=e)
+
+    def _value(self, z: xp.ndarray, t: xp.ndarray, e: xp.ndarray) -> float:
+        tmp = self._buffer('tmp', xp.broadcast_shapes(z.shape, t.shape), e.dtype)
+        xp.log1p(e, out=tmp)
+        tmp += xp.maximum(z, 0)
+        tmp -= t * z
+        return xp.mean(tmp)
+
+    def _grad(self, z: xp.ndarray, t: xp.ndarray, e: xp.ndarray) -> xp.ndarray:
+        grad = self._buffer('grad', xp.broadcast_shapes(z.shape, t.shape), e.dtype)
+        xp.add(e, 1, out=grad)
+        xp.divide(xp.where(z >= 0, 1, e), grad, out=grad)
+        grad -= t
+        grad /= z.shape[0]
+        return grad
@@ -1,10 +1,19 @@
+from typing import Tuple
+
 from backend.backend import xp
-from layers.activation_functions.softmax import Softmax
+from layers.activation_functions.softmax import log_softmax
 from loss_functions.abstract_loss_function import LossFunction
-from utils.utils import to_one_hot
 
 
 class CrossEntropy(LossFunction):
+    """
+    E = −1/Nb sum t log(y). With from_logits=True the inputs are logits and y = Softmax(logits). The loss is then computed
+    from log-probabilities obtained with the log-sum-exp trick, so large logits cannot overflow, and the gradient
+    simplifies to dE/dlogits = (Softmax(logits) − t) / Nb. value_and_grad computes both from a single log-softmax.
+
+    With one_hot=False the targets are class labels, one per row of y. No one-hot matrix is built: the loss sums the
+    log-probabilities gathered at the labels, and the gradient subtracts 1 from Softmax(logits) at the labels in place.
+    """
 
     def __init__(self, from_logits: bool = True, one_hot: bool = True):
         super().__init__('CrosseEntropyLoss')
@@ -12,17 +21,61 @@ class CrossEntropy(LossFunction):
         self.one_hot = one_hot
 
     def __call__(self, y: xp.ndarray, t: xp.ndarray) -> float:
-        if not self.one_hot:
-            t = to_one_hot(t, y.shape[-1])
         if self.from_logits:
-            y = Softmax()(y)
+            log_probs, _ = self._log_softmax(y)
+            return self._value(log_probs, t)
+        if not self.one_hot:
+            return -xp.sum(xp.log(y.reshape(-1)[label_positions(y, t)])) / y.shape[0]
         return -xp.sum(xp.log(y) * t) / t.shape[0]
 
     def backward(self, y: xp.ndarray, t: xp.ndarray) -> xp.ndarray:
-        if not self.one_hot:
-            t = to_one_hot(t, y.shape[-1])
         if self.from_logits:
-            y = Softmax()(y)
-            return (y - t) / t.shape[0]
+            _, grad = self._log_softmax(y)
+            return self._grad(grad, t)
+        if not self.one_hot:
+            return label_reciprocals(y, t, self._buffer('grad', y.shape, xp.result_type(y, 1.0)))
+        return -t/(y * y.shape[0])
+
+    def value_and_grad(self, y: xp.ndarray, t: xp.ndarray) -> Tuple[float, xp.ndarray]:
+        if not self.from_logits:
+            return super().value_and_grad(y, t)
+
+        log_probs, probs = self._log_softmax(y)
+        return self._value(log_probs, t), self._grad(probs, t)
+
+    def _log_softmax(self, y: xp.ndarray) -> Tuple[xp.ndarray, xp.ndarray]:
+        dtype = xp.result_type(y, 1.0)
+        return log_softmax(y, self._buffer('log_probs', y.shape, dtype), self._buffer('probs', y.shape, dtype))
+
+    def _value(self, log_probs: xp.ndarray, t: xp.ndarray) -> float:
+        if not self.one_hot:
+            return -xp.sum(log_probs.reshape(-1)[label_positions(log_probs, t)]) / log_probs.shape[0]
+        log_probs *= t
+        return -xp.sum(log_probs) / t.shape[0]
+
+    def _grad(self, probs: xp.ndarray, t: xp.ndarray) -> xp.ndarray:
+        if not self.one_hot:
+            probs.reshape(-1)[label_positions(probs, t)] -= 1
         else:
-            return -t/(y * y.shape[0])
+            probs -= t
+        probs /= probs.shape[0]
+        return probs
+
+
+def label_positions(y: xp.ndarray, t: xp.ndarray) -> xp.ndarray:
+    """
+    The positions in y.reshape(-1) of the elements at the class labels t, one label for every row of the last axis of y
+    (t may have a trailing axis of length 1, and may hold the labels as floats).
+    """
+    labels = t.reshape(-1).astype(xp.intp, copy=False)
+    return xp.arange(0, y.size, y.shape[-1]) + labels
+
+
+def label_reciprocals(y: xp.ndarray, t: xp.ndarray, out: xp.ndarray) -> xp.ndarray:
+    """
+    −1 / (Nb y) at the class labels t and zero elsewhere, the gradient of −1/Nb sum log(y) over the labelled elements.
+    """
+    positions = label_positions(y, t)
+    out.fill(0)
+    out.reshape(-1)[positions] = -1 / (y.reshape(-1)[positions] * y.shape[0])
+    return out
@@ -1,10 +1,22 @@
+from typing import Tuple
+
 from backend.backend import xp
-from layers.activation_functions.softmax import Softmax
+from layers.activation_functions.softmax import log_softmax
 from loss_functions.abstract_loss_function import LossFunction
-from utils.utils import to_one_hot
+from loss_functions.cross_entropy import label_positions, label_reciprocals
 
 
 class DKL(LossFunction):
+    """
+    Kullback-Leibler divergence between the target distribution t and the predicted distribution y,
+    E = 1/Nb sum t log(t / y) = 1/Nb (sum t log t − sum t log y), where terms with t = 0 contribute nothing.
+
+    With from_logits=True, y = Softmax(logits) and log y is computed with the log-sum-exp trick, as in CrossEntropy. Only
+    the second sum depends on the logits, so the gradient is (Softmax(logits) − t) / Nb.
+
+    With one_hot=False the targets are class labels. The first sum is then zero, and the loss and gradient are those of
+    CrossEntropy, computed at the labels without building a one-hot matrix.
+    """
 
     def __init__(self, from_logits: bool = True, one_hot: bool = True):
         super().__init__('KL-divergence')
@@ -12,16 +24,43 @@ class DKL(LossFunction):
         self.one_hot = one_hot
 
     def __call__(self, y: xp.ndarray, t: xp.ndarray) -> float:
-        if not self.one_hot:
-            t = to_one_hot(t, y.shape[-1])
         if self.from_logits:
-            y = Softmax()(y)
+            log_probs, _ = self._log_softmax(y)
+            return self._value(log_probs, t)
+        if not self.one_hot:
+            return -xp.sum(xp.log(y.reshape(-1)[label_positions(y, t)])) / y.shape[0]
         return xp.sum(xp.where(t > 0, t * xp.log(t/y), 0)) / t.shape[0]
 
     def backward(self, y: xp.ndarray, t: xp.ndarray) -> xp.ndarray:
-        if not self.one_hot:
-            t = to_one_hot(t, y.shape[-1])
         if self.from_logits:
-            return (y - t) / t.shape[0]
+            _, grad = self._log_softmax(y)
+            return self._grad(grad, t)
+        if not self.one_hot:
+            return label_reciprocals(y, t, self._buffer('grad', y.shape, xp.result_type(y, 1.0)))
+        return -t/(y * y.shape[0])
+
+    def value_and_grad(self, y: xp.ndarray, t: xp.ndarray) -> Tuple[float, xp.ndarray]:
+        if not self.from_logits:
+            return super().value_and_grad(y, t)
+
+        log_probs, probs = self._log_softmax(y)
+        return self._value(log_probs, t), self._grad(probs, t)
+
+    def _log_softmax(self, y: xp.ndarray) -> Tuple[xp.ndarray, xp.ndarray]:
+        dtype = xp.result_type(y, 1.0)
+        return log_softmax(y, self._buffer('log_probs', y.shape, dtype), self._buffer('probs', y.shape, dtype))
+
+    def _value(self, log_probs: xp.ndarray, t: xp.ndarray) -> float:
+        if not self.one_hot:
+            return -xp.sum(log_probs.reshape(-1)[label_positions(log_probs, t)]) / log_probs.shape[0]
+        t_log_t = xp.sum(t * xp.log(xp.where(t > 0, t, 1)))
+        log_probs *= t
+        return (t_log_t - xp.sum(log_probs)) / t.shape[0]
+
+    def _grad(self, probs: xp.ndarray, t: xp.ndarray) -> xp.ndarray:
+        if not self.one_hot:
+            probs.reshape(-1)[label_positions(probs, t)] -= 1
         else:
-            return -t/(y * y.shape[0])
+            probs -= t
+        probs /= probs.shape[0]
+        return probs
@@ -1,5 +1,8 @@
 from test_examples.binary_classification import test_binary_classification
+from test_examples.cnn import test_CNN
+from test_examples.lazy_optimizers import test_lazy_optimizers
 from test_examples.regression import test_regression
+from test_examples.rnn import test_basic_RNN, test_LSTM_GRU
 from test_examples.test_mnist import test_mnist
 
 if __name__ == '__main__':
@@ -10,6 +13,7 @@ if __name__ == '__main__':
     # test_CNN()
     # test_basic_RNN()
     # test_LSTM_GRU()
+    # test_lazy_optimizers()
     # test_VAE()
     # test_GAN()
     pass
\ No newline at end of file
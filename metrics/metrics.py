@@ -1,15 +1,18 @@
 from abc import ABC, abstractmethod
+from typing import List
 
 from backend.backend import xp
-from layers.activation_functions.sigmoid import Sigmoid
-from utils.utils import to_one_hot
 
 
 class Metric(ABC):
     """
-    Different metrics are useful for evaluating training results and tracking progress. The key method is calculate_metric,
-    which computes the metric for a given batch. Since we also want to track metrics across an entire epoch, the class
-    provides calculate_for_epoch, which accumulates results over multiple batches.
+    Different metrics are useful for evaluating training results and tracking progress. The key method is update, which
+    adds the results of a batch to the totals of the epoch; calculate_for_epoch then computes the metric over the entire
+    epoch. calculate does the same as update and also returns the value of the metric for the batch.
+
+    The totals are kept in arrays on the device and are only converted to a Python number in calculate_for_epoch, so
+    tracking a metric does not force the host to wait for the device after every batch. Several metrics are updated with
+    update_metrics, which lets them share intermediate results (such as the predicted classes) through a cache.
 
     It is also helpful to inspect how a metric evolves over time, for example by plotting it. For this reason, the metric
     value for each epoch is stored.
@@ -18,14 +21,28 @@ class Metric(ABC):
     def __init__(self, _name: str):
         self.values_per_epoch = []
         self.name = _name
+        self._sum = xp.zeros((), dtype=xp.float64)
+        self._count = 0
 
     @abstractmethod
-    def calculate(self, y: xp.ndarray, t: xp.ndarray) -> float:
+    def update(self, y: xp.ndarray, t: xp.ndarray, cache: dict = None):
+        """
+        Adds the batch to the totals. cache is a dictionary of intermediate results shared by the metrics updated with
+        the same batch.
+        """
         pass
 
-    @abstractmethod
+    def calculate(self, y: xp.ndarray, t: xp.ndarray) -> float:
+        total, count = float(self._sum), self._count
+        self.update(y, t)
+        return (float(self._sum) - total) / (self._count - count)
+
     def calculate_for_epoch(self) -> float:
-        pass
+        value = float(self._sum) / self._count
+        self._sum.fill(0)
+        self._count = 0
+        self.values_per_epoch.append(value)
+        return value
 
     def last_epoch_value(self) -> float:
         return xp.round(self.values_per_epoch[-1], 4)  # round to 4 decimals
@@ -41,17 +58,8 @@ class BinaryAccuracy(Metric):
     def __init__(self, from_logits: bool = False):
         super().__init__("accuracy")
         self.from_logits = from_logits
-        self._count = 0
-        self._sum = 0
 
-    def calculate_for_epoch(self) -> float:
-        a = self._sum / self._count
-        self._sum = 0
-        self._count = 0
-        self.values_per_epoch.append(a)
-        return a
-
-    def calculate(self, y: xp.ndarray, t: xp.ndarray) -> float:
+    def update(self, y: xp.ndarray, t: xp.ndarray, cache: dict = None):
         """
         Here we compute accuracy based on network_output and target_value. Binary and multiclass classification must be handled
         separately because their target representations differ.
@@ -59,20 +67,19 @@ class BinaryAccuracy(Metric):
         In binary classification each sample belongs to exactly one of two classes, labeled 0 or 1. Thus target_value is an
         Nb × 1 vector of zeros and ones, and the network output (after a sigmoid) is also Nb × 1, representing the probability
         that a sample belongs to class 1. We classify outputs > 0.5 as class 1 and ≤ 0.5 as class 0. A prediction is correct when
-        abs(round(output) − target_value) = 0.
+        abs(round(output) − target_value) = 0. With logits, sigmoid(output) > 0.5 exactly when output > 0, so the sigmoid
+        itself is not needed.
 
         Multiclass (non-multilabel) classification also assigns exactly one label per sample, but uses a different target format.
         """
+        cache = {} if cache is None else cache
+        key = ('binary prediction', self.from_logits)
+        if key not in cache:
+            cache[key] = xp.greater(y, 0 if self.from_logits else 0.5)
 
-        if self.from_logits:
-            y = Sigmoid()(y)
-        a = xp.sum(1 - xp.abs(xp.round(y) - t))
-
-        self._sum += a
+        self._sum += xp.count_nonzero(xp.equal(cache[key], t))
         self._count += y.size
 
-        return float(a / y.size)
-
 
 class Accuracy(Metric):
     """
@@ -91,47 +98,43 @@ class Accuracy(Metric):
 
     def __init__(self, one_hot: bool = True):
         super().__init__("accuracy")
-        self._count = 0
-        self._sum = 0
         self.one_hot = one_hot
 
-    def calculate_for_epoch(self) -> float:
-        a = self._sum / self._count
-        self._sum = 0
-        self._count = 0
-        self.values_per_epoch.append(a)
-        return a
-
-    def calculate(self, y: xp.ndarray, t: xp.ndarray) -> float:
-        if not self.one_hot:
-            t = to_one_hot(t, y.shape[-1])
-
-        tmp1 = xp.argmax(y, axis=-1)
-        tmp2 = xp.argmax(t, axis=-1)
-        incorrect_classified = xp.count_nonzero(tmp1 - tmp2)
-        num_of_samples = y.size / y.shape[-1]
-        a = (num_of_samples - incorrect_classified)
+    def update(self, y: xp.ndarray, t: xp.ndarray, cache: dict = None):
+        """
+        Targets given as class labels (one_hot=False) are compared with the predicted classes directly.
+        """
+        cache = {} if cache is None else cache
+        if 'predicted classes' not in cache:
+            cache['predicted classes'] = xp.argmax(y, axis=-1)
+        if self.one_hot:
+            if 'target classes' not in cache:
+                cache['target classes'] = xp.argmax(t, axis=-1)
+            target = cache['target classes']
+        else:
+            target = t.reshape(y.shape[:-1])
 
-        self._sum += a
-        self._count += num_of_samples
+        self._sum += xp.count_nonzero(xp.equal(cache['predicted classes'], target))
+        self._count += y.size // y.shape[-1]
 
-        return float(a / num_of_samples)
 
 class MSEMetric(Metric):
+    """
+    The mean squared error of a batch, averaged over the batches of the epoch.
+    """
+
     def __init__(self):
         super().__init__("MSE")
-        self._sum = 0
-        self._count = 0
 
-    def calculate(self, y, t):
-        mse = xp.mean((y - t)**2)
-        self._sum += mse
+    def update(self, y: xp.ndarray, t: xp.ndarray, cache: dict = None):
+        self._sum += xp.mean(xp.square(y - t))
         self._count += 1
-        return float(mse)
 
-    def calculate_for_epoch(self):
-        value = self._sum / self._count
-        self.values_per_epoch.append(value)
-        self._sum = 0
-        self._count = 0
-        return value
\ No newline at end of file
+
+def update_metrics(metrics: List[Metric], y: xp.ndarray, t: xp.ndarray):
+    """
+    Updates every metric with the batch. Intermediate results are computed once and shared by all metrics.
+    """
+    cache = {}
+    for metric in metrics:
+        metric.update(y, t, cache)
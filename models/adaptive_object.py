@@ -1,25 +1,70 @@
 import warnings
-from abc import abstractmethod
+from typing import Dict, List, Tuple
 
 from layers.function import Function
-from optimizers.abstract_optimizer import Optimizer
+from optimizers.abstract_optimizer import Optimizer, ParamGroup
+from optimizers.sparse_gradient import SparseGradient
 
 
 class AdaptiveObject(Function):
     """
-    AdaptiveObject instances are functions that can adjust their internal parameters or components. Each subclass must
-    implement update_parameters.
+    AdaptiveObject instances are functions that can adjust their internal parameters or components.
 
     Parameter updates are performed by an optimizer (a class derived from AbstractOptimizer).
+
+    Subclasses list their trainable parameters in `_trainable` as pairs of attribute names (parameter, gradient). The
+    arrays behind these attributes may be replaced by views into larger buffers (see Model.flatten_parameters), so
+    gradients must always be written into the existing arrays, for example through the `out` parameter. With this
+    information update_parameters registers the tensors with the optimizer once and afterwards only calls its step.
+    Subclasses with other needs override update_parameters.
+
+    Arrays that are not trained but belong to the state of the object, such as running averages, are listed in `_state`.
+    Setting `dtype` casts the arrays from both lists.
+
+    Gradients that can be sparse map their attribute name to the attribute of their SparseGradient in `_sparse`.
     """
 
+    _trainable: Tuple[Tuple[str, str], ...] = ()
+    _state: Tuple[str, ...] = ()
+    _sparse: Dict[str, str] = {}
+
     def __init__(self, name: str = 'unnamed', optimizer: Optimizer = None):
         super().__init__(name)
         self._optimizer = optimizer
+        self._param_group: ParamGroup = None
+
+    @property
+    def dtype(self):
+        return Function.dtype.fget(self)
+
+    @dtype.setter
+    def dtype(self, val):
+        Function.dtype.fset(self, val)
+        names = [name for pair in self._trainable for name in pair] + list(self._state)
+        for name in names:
+            array = getattr(self, name, None)
+            if array is not None and array.dtype != self.dtype:
+                setattr(self, name, array.astype(self.dtype))
 
-    @abstractmethod
     def update_parameters(self):
-        pass
+        params = [getattr(self, param) for param, _ in self._trainable]
+        grads = [getattr(self, grad) for _, grad in self._trainable]
+        sparse = [self.sparse_gradient(grad) for _, grad in self._trainable]
+
+        if self._param_group is None or self._param_group.optimizer is not self._optimizer:
+            self._param_group = self._optimizer.register(params, grads, sparse)
+        elif not self._param_group.bound_to(params, grads):
+            self._param_group.rebind(params, grads, sparse)
+        self._optimizer.step(self._param_group)
+
+    def sparse_gradient(self, grad: str) -> SparseGradient:
+        """
+        The SparseGradient of the gradient attribute grad, or None if that gradient is always dense.
+        """
+        return getattr(self, self._sparse[grad]) if grad in self._sparse else None
+
+    def _trainable_slots(self) -> List[Tuple['AdaptiveObject', str, str]]:
+        return [(self, param, grad) for param, grad in self._trainable]
 
     def set_optimizer(self, optimizer: Optimizer, force: bool = False):
         """
@@ -0,0 +1,200 @@
+import multiprocessing
+import threading
+from typing import Tuple
+
+import numpy
+
+from backend.backend import xp
+from backend.shared_memory import fork_shared_array, limit_blas_threads
+from backend.sparse import issparse
+from utils.dataset import Dataset
+
+
+class DataParallel:
+    """
+    Synchronous data-parallel training of a Model on several CPU processes (see Model.fit with workers > 1).
+
+    The parameters and gradients of the model are flattened into memory shared by all processes (see
+    Model.flatten_parameters), and num_workers - 1 processes are forked, each of them holding a replica of the model whose
+    parameters are views of the same shared array. Every minibatch is copied into a shared buffer and split into
+    num_workers shards of (almost) equal size; process k runs the forward and backward pass on shard k, the main process
+    included, and writes its gradient, scaled by the fraction of the minibatch in its shard, into its own row of a shared
+    gradient matrix. The rows are then summed, each process reducing its own slice of the columns, and the main process
+    applies a single optimizer step. The sum of the scaled shard gradients is the gradient of the mean loss over the whole
+    minibatch, so the training matches single-process training up to the order of floating point additions. The summed
+    gradients are dense, so optimizers update sparse gradients (see SparseGradient, e.g. of an Embedding) in full.
+
+    Statistics computed over the minibatch cannot be reproduced exactly: BatchNormalization normalizes each shard with
+    the statistics of the shard, and its running averages, kept by every replica, are averaged over the replicas at the
+    end of every epoch.
+
+    Only the NumPy backend is supported. While training, every process limits its BLAS library to one thread (if
+    threadpoolctl is installed), so that num_workers processes do not compete for the same cores.
+    """
+
+    _STEP = 0
+    _SYNC_STATE = 1
+    _STOP = 2
+
+    def __init__(self, model, num_workers: int, data: Dataset):
+        if xp is not numpy:
+            raise Exception("Data-parallel training is only supported with the NumPy backend!")
+        if num_workers < 2:
+            raise ValueError("Data-parallel training needs at least 2 workers")
+        if issparse(data.x):
+            raise Exception("Data-parallel training does not support sparse inputs!")
+
+        self.model = model
+        self.num_workers = num_workers
+        self._processes = []
+        self._thread_limits = None
+
+        # the first forward pass creates the parameters of layers such as BatchNormalization and gives the output shape
+        training = model.training
+        model.training = False
+        sample_x, _ = data.gather(slice(0, 1))
+        output_shape = model.forward(sample_x).shape[1:]
+        model.training = training
+
+        flat_params = model.flat_parameters
+        size = sum(getattr(layer, param).size for layer, param, _ in model._trainable_slots())
+        dtype = model.dtype if flat_params is None else flat_params.dtype
+        self._params = fork_shared_array((size,), dtype)
+        self._grads = fork_shared_array((num_workers, size), dtype)
+        model.flatten_parameters(self._params, self._grads[0])
+
+        x_dtype, y_dtype = data.batch_dtypes()
+        self._x = fork_shared_array((data.batch_size,) + data.x.shape[1:], x_dtype)
+        self._y = fork_shared_array((data.batch_size,) + data.y.shape[1:], y_dtype)
+        self._outputs = fork_shared_array((data.batch_size,) + output_shape, dtype)
+        self._losses = fork_shared_array((num_workers,), numpy.float64)
+        self._control = fork_shared_array((2,), numpy.int64)
+
+        self._state = [getattr(layer, name) for layer in model._stateful_layers() for name in layer._state
+                       if getattr(layer, name, None) is not None]
+        self._state_rows = fork_shared_array((num_workers, sum(s.size for s in self._state)), numpy.float64)
+
+        self._barrier = multiprocessing.get_context('fork').Barrier(num_workers)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop(abort=exc_type is not None)
+
+    def start(self):
+        self._thread_limits = limit_blas_threads()
+        context = multiprocessing.get_context('fork')
+        self._processes = [context.Process(target=self._work, args=(rank,), daemon=True)
+                           for rank in range(1, self.num_workers)]
+        for process in self._processes:
+            process.start()
+        self.model._data_parallel = self
+
+    def stop(self, abort: bool = False):
+        """
+        Stops the workers and moves the parameters of the model back into memory of its own. With abort, workers waiting
+        in the middle of a step are released as well, which is needed when the main process fails during a step.
+        """
+        self.model._data_parallel = None
+        if abort:
+            self._barrier.abort()
+        elif self._processes and not self._barrier.broken:
+            self._command(self._STOP, 0)
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        if self._thread_limits is not None:
+            self._thread_limits.restore_original_limits()
+        self.model.flatten_parameters()
+
+    def process_minibatch(self, x: xp.ndarray, y: xp.ndarray) -> Tuple[xp.ndarray, None, float]:
+        """
+        Runs the forward and backward pass of the minibatch on all workers and leaves the gradient of the mean loss in
+        the flat gradients of the model. Returns the outputs and the mean loss, like Model._process_minibatch.
+        """
+        n = len(x)
+        if n > len(self._x):
+            raise ValueError("The minibatch has {} samples, the buffers were allocated for {}".format(n, len(self._x)))
+        self._x[:n] = x
+        self._y[:n] = y.reshape(self._y[:n].shape)
+
+        self._command(self._STEP, n)
+        self._step(0, n)
+        # the gradients of all workers were added into those of the main process, which are therefore dense
+        self.model._reset_sparse_gradients()
+        return self._outputs[:n], None, float(self._losses.sum())
+
+    def sync_state(self):
+        """
+        Averages the non-trainable state (such as running statistics) of the replicas and gives every replica the average.
+        """
+        self._command(self._SYNC_STATE, 0)
+        self._sync_state(0)
+
+    def _command(self, command: int, n: int):
+        self._control[0] = command
+        self._control[1] = n
+        self._barrier.wait()
+
+    def _work(self, rank: int):
+        model = self.model
+        model._data_parallel = None
+        model.profiler = None  # only the main process records its share of every step
+        model.flatten_parameters(self._params, self._grads[rank])
+        model.training = True
+        try:
+            while True:
+                self._barrier.wait()
+                command, n = int(self._control[0]), int(self._control[1])
+                if command == self._STOP:
+                    return
+                if command == self._SYNC_STATE:
+                    self._sync_state(rank)
+                else:
+                    self._step(rank, n)
+        except threading.BrokenBarrierError:
+            pass
+        except BaseException:
+            self._barrier.abort()
+            raise
+
+    def _step(self, rank: int, n: int):
+        bounds = numpy.linspace(0, n, self.num_workers + 1).astype(int)
+        start, end = bounds[rank], bounds[rank + 1]
+        grads = self._grads[rank]
+        if end > start:
+            output, _, loss = self.model._forward_backward(self._x[start: end], self._y[start: end])
+            self._outputs[start: end] = output
+            grads *= (end - start) / n
+            self._losses[rank] = loss * (end - start) / n
+        else:
+            grads.fill(0)
+            self._losses[rank] = 0
+        profiler = self.model.profiler
+        start = None if profiler is None else profiler.clock()
+        self._barrier.wait()
+
+        columns = numpy.linspace(0, grads.size, self.num_workers + 1).astype(int)
+        total = self._grads[0, columns[rank]: columns[rank + 1]]
+        for other in range(1, self.num_workers):
+            total += self._grads[other, columns[rank]: columns[rank + 1]]
+        self._barrier.wait()
+        if profiler is not None:
+            profiler.record('gradient reduction', 'data-parallel', start)
+
+    def _sync_state(self, rank: int):
+        row = self._state_rows[rank]
+        offset = 0
+        for s in self._state:
+            row[offset: offset + s.size] = s.ravel()
+            offset += s.size
+        self._barrier.wait()
+
+        offset = 0
+        for s in self._state:
+            s[...] = self._state_rows[:, offset: offset + s.size].mean(axis=0).reshape(s.shape)
+            offset += s.size
+        self._barrier.wait()
+
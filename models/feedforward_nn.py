@@ -1,23 +1,87 @@
 import pickle
 import time
-from typing import List, Tuple, Union
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Union
 
 from models.adaptive_object import AdaptiveObject
+from models.data_parallel import DataParallel
+from models.hogwild import Hogwild
 from backend.backend import xp
+from backend.sparse import issparse
+from backend.workspace import Workspace
 from layers.function import Function
 from loss_functions.abstract_loss_function import LossFunction
-from metrics.metrics import Metric
-from optimizers.abstract_optimizer import Optimizer
+from metrics.metrics import Metric, update_metrics
+from optimizers.abstract_optimizer import Optimizer, ParamGroup
+from optimizers.sparse_gradient import SparseGradient
+from utils import checkpoint
 from utils.dataset import Dataset
+from utils.profiler import Profiler
 
 
 class Model(AdaptiveObject):
-    def __init__(self, loss_function: LossFunction = None, name: str = "dnn_model"):
+    """
+    A sequential model. Layers are applied in the order in which they were added.
+
+    The model owns a Workspace that is shared by all of its layers and its loss function, so the tensors of a training
+    step live in buffers that are allocated during the first minibatches and reused afterwards. Setting `workspace` to
+    None turns this off.
+
+    With flat_parameters=True, all trainable parameters of the model are moved into one contiguous array and all of their
+    gradients into another (see flatten_parameters). Each layer keeps working with views into these arrays, while the
+    model can update, zero, measure or copy every parameter with a single operation on one array.
+
+    Parameters are registered with their optimizers once, as one ParamGroup per optimizer that holds the tensors of all
+    layers using it (only the two flat arrays in the flat mode), and every training step then calls each optimizer once.
+
+    dtype sets the floating point type of all layers of the model and of the data it is trained on (backend.floatx() by
+    default). With a reduced precision such as float32, master_dtype='float64' keeps a float64 master copy of every
+    trainable parameter: optimizers update the master copies, which are then rounded into the parameters used by the
+    layers, so small updates are not lost to rounding. When an optimizer updates only the slices named by a
+    SparseGradient, only these slices are copied back.
+
+    With micro_batches=K, every training minibatch is processed as K micro-batches whose gradients are accumulated before
+    one optimizer step, so large minibatches can be used while only the activations of a micro-batch are held in memory.
+
+    checkpoints turns on activation checkpointing, which trades computation for memory in deep models: the layers are
+    split into segments, given either as their number or as the indices of the layers that start a segment, and a
+    training forward pass keeps only the input of every segment, releasing everything the layers of a segment retained
+    for backward as soon as the segment is done. backward then repeats the forward pass of one segment at a time, from
+    its stored input, before propagating through it, so only one segment holds its activations at a time; the last
+    segment is not repeated, since it is still intact. With about sqrt(number of layers) segments, the memory of the
+    activations shrinks from the whole depth to about two segments at the cost of roughly one more forward pass per
+    step. The gradients are those of the plain backward pass. Checkpointing turns the workspace off, because its
+    buffers would keep every intermediate result alive.
+    """
+
+    def __init__(self, loss_function: LossFunction = None, name: str = "dnn_model", flat_parameters: bool = False,
+                 dtype=None, master_dtype=None, micro_batches: int = 1, checkpoints: Union[int, List[int]] = None):
         super().__init__(name)
         self._layers: List[Function] = list()
 
         self._loss = loss_function
         self._training = False
+        self.workspace = Workspace()
+
+        self._flat = flat_parameters
+        self._flat_params: xp.ndarray = None
+        self._flat_grads: xp.ndarray = None
+        self._flat_optimizer: Optimizer = None
+
+        self._param_groups: List[Tuple[Optimizer, ParamGroup]] = []
+        self._param_groups_valid = False
+        self._data_parallel: DataParallel = None
+        self.profiler: Profiler = None
+
+        self.micro_batches = micro_batches
+        self._accumulators: List[xp.ndarray] = []
+
+        self.checkpoints = checkpoints
+        self._segment_inputs: List[xp.ndarray] = []
+
+        self.dtype = dtype
+        self._master_dtype = None if master_dtype is None else xp.dtype(master_dtype)
+        self._master_copies: List[Tuple[xp.ndarray, xp.ndarray, SparseGradient]] = []
 
     @property
     def training(self) -> bool:
@@ -29,6 +93,57 @@ class Model(AdaptiveObject):
         for layer in self._layers:
             layer.training = val
 
+    @property
+    def dtype(self):
+        return Function.dtype.fget(self)
+
+    @dtype.setter
+    def dtype(self, val):
+        Function.dtype.fset(self, val)
+        if val is None:
+            return
+
+        for layer in self._layers:
+            layer.dtype = val
+        # casting replaced the arrays of the layers, so views into the flat buffers are gone
+        self._flat_params = None
+        self._flat_grads = None
+        self._param_groups_valid = False
+
+    @property
+    def workspace(self) -> Workspace:
+        return self._workspace
+
+    @workspace.setter
+    def workspace(self, val: Workspace):
+        self._workspace = val
+        for layer in self._layers:
+            layer.workspace = val
+        if self._loss is not None:
+            self._loss.workspace = val
+
+    @property
+    def checkpoints(self) -> Union[int, List[int]]:
+        return self._checkpoints
+
+    @checkpoints.setter
+    def checkpoints(self, val: Union[int, List[int]]):
+        self._checkpoints = val
+        if val is not None:
+            self.workspace = None
+
+    def _segments(self) -> List[Tuple[int, int]]:
+        """
+        The (start, end) layer indices of the checkpointed segments.
+        """
+        n = len(self._layers)
+        if isinstance(self._checkpoints, int):
+            starts = [n * k // self._checkpoints for k in range(self._checkpoints)]
+        else:
+            starts = [0] + list(self._checkpoints)
+        bounds = sorted(set(start for start in starts if 0 <= start < n)) + [n]
+        return list(zip(bounds[:-1], bounds[1:]))
+
     @property
     def parameters(self) -> list:
         params = list()
@@ -38,57 +153,443 @@ class Model(AdaptiveObject):
 
     @parameters.setter
     def parameters(self, val: tuple):
+        """
+        Values are copied into the existing arrays whenever the shapes match, so views into the flat buffers and anything
+        else that refers to the parameter arrays remain valid.
+        """
         for i in range(len(val)):
-            self._layers[i].parameters = val[i]
+            layer = self._layers[i]
+            current = layer.parameters
+            if isinstance(layer, Model) or len(current) != len(val[i]) or \
+                    any(c is None or c.shape != v.shape for c, v in zip(current, val[i])):
+                layer.parameters = val[i]
+                self._flat_params = None  # the layer has new arrays, so the flat buffers must be rebuilt
+                self._param_groups_valid = False
+                continue
+            for c, v in zip(current, val[i]):
+                c[...] = v
+
+        if self._master_dtype is not None:
+            self._param_groups_valid = False  # master copies are taken from the new values
+
+    @property
+    def flat_parameters(self) -> xp.ndarray:
+        return self._flat_params
+
+    @property
+    def flat_gradients(self) -> xp.ndarray:
+        return self._flat_grads
+
+    def _trainable_slots(self) -> List[Tuple[AdaptiveObject, str, str]]:
+        slots = []
+        for layer in self._layers:
+            if isinstance(layer, AdaptiveObject):
+                slots.extend(layer._trainable_slots())
+        return slots
+
+    def flatten_parameters(self, params_buffer: xp.ndarray = None, grads_buffer: xp.ndarray = None):
+        """
+        Copies every trainable parameter into one contiguous 1-D array and replaces the parameter in its layer with a view
+        of the matching segment. Gradients get the same treatment in a second array. The buffers can be provided by the
+        caller (for example arrays placed in shared memory); they must hold exactly as many elements as the model has
+        trainable parameters.
+
+        Layers such as BatchNormalization create their parameters during the first forward pass, so this method has to be
+        called after it. Models created with flat_parameters=True do this automatically on the first training step.
+        """
+        slots = self._trainable_slots()
+        params = [getattr(layer, param) for layer, param, _ in slots]
+        if any(p is None for p in params):
+            raise Exception("All parameters must be initialized before flattening, run a forward pass first!")
+
+        size = sum(p.size for p in params)
+        dtype = xp.result_type(*params) if params else float
+        if params_buffer is None:
+            params_buffer = xp.empty(size, dtype=dtype)
+        if grads_buffer is None:
+            grads_buffer = xp.zeros(size, dtype=params_buffer.dtype)
+        if params_buffer.size != size or grads_buffer.size != size:
+            raise Exception("Flat buffers must have {} elements!".format(size))
+
+        offset = 0
+        for (layer, param, grad), p in zip(slots, params):
+            p_view = params_buffer[offset: offset + p.size].reshape(p.shape)
+            g_view = grads_buffer[offset: offset + p.size].reshape(p.shape)
+            p_view[...] = p
+            g_view[...] = getattr(layer, grad) if getattr(layer, grad) is not None else 0
+            setattr(layer, param, p_view)
+            setattr(layer, grad, g_view)
+            offset += p.size
+
+        self._flat = True
+        self._flat_params = params_buffer
+        self._flat_grads = grads_buffer
+        self._flat_optimizer = self._shared_optimizer()
+        self._param_groups_valid = False
+
+    def _shared_optimizer(self) -> Optimizer:
+        """
+        Returns the optimizer used by every adaptive layer, or None if the layers use different optimizers.
+        """
+        optimizers = {id(layer._optimizer): layer._optimizer for layer, _, _ in self._trainable_slots()}
+        if len(optimizers) != 1:
+            return None
+        return next(iter(optimizers.values()))
+
+    def zero_grad(self):
+        if self._flat_grads is not None:
+            self._flat_grads.fill(0)
+            return
+        for layer, _, grad in self._trainable_slots():
+            if getattr(layer, grad) is not None:
+                getattr(layer, grad).fill(0)
+
+    def grad_norm(self) -> float:
+        """
+        Euclidean norm of the gradient of all trainable parameters.
+        """
+        if self._flat_grads is not None:
+            return float(xp.sqrt(xp.dot(self._flat_grads, self._flat_grads)))
+        total = 0.0
+        for layer, _, grad in self._trainable_slots():
+            g = getattr(layer, grad)
+            if g is not None:
+                total += float(xp.sum(g * g))
+        return total ** 0.5
 
     def save_params(self, filename: str = None):
+        """
+        Writes the parameters in the binary format of utils.checkpoint, by default to saved_models/<name>.ckpt.
+        """
         if filename is None:
-            filename = "saved_models/" + self.name + ".pickle"
+            filename = "saved_models/" + self.name + ".ckpt"
 
-        with open(filename, "wb") as file:
-            pickle.dump(self.parameters, file)
+        checkpoint.save(filename, self.parameters, [layer.name for layer in self._layers])
 
         print("Parameters saved at", filename)
 
-    def load_params(self, filename: str):
-        with open(filename, "rb") as file:
-            self.parameters = pickle.load(file)
+    def load_params(self, filename: str, mmap_mode: str = None):
+        """
+        Loads parameters saved by save_params; files written with pickle by earlier versions are still accepted.
+
+        By default the values are copied into the existing parameter arrays. With mmap_mode (for example 'r') the file is
+        mapped into memory and the layers use its arrays directly: the model is ready without reading the file, and
+        scoring processes that load the same file share a single copy of the parameters. Read-only mapped parameters are
+        meant for inference; training such a model fails at the first update.
+        """
+        if not checkpoint.is_checkpoint(filename):
+            with open(filename, "rb") as file:
+                self.parameters = pickle.load(file)
+            return
+
+        params = checkpoint.load(filename, mmap_mode)
+        if mmap_mode is None:
+            self.parameters = params
+        else:
+            self._bind_parameters(params)
+
+    def _bind_parameters(self, params: list):
+        """
+        Makes the layers use the given arrays as their parameters instead of copying the values into their own arrays.
+        """
+        for layer, p in zip(self._layers, params):
+            if isinstance(layer, Model):
+                layer._bind_parameters(p)
+            else:
+                layer.parameters = tuple(p)
+        self._flat_params = None
+        self._flat_grads = None
+        self._param_groups_valid = False
 
     def __call__(self, input_tensor: xp.ndarray) -> xp.ndarray:
+        if self._checkpoints is not None and self._training:
+            return self._checkpointed_forward(input_tensor)
+
+        profiler = self.profiler
+        start = None if profiler is None else profiler.clock()
         for i in range(len(self._layers)):
             input_tensor = self._layers[i].forward(input_tensor)
+            if profiler is not None:
+                start = profiler.record(_layer_label(i, self._layers[i]), 'forward', start)
 
         return input_tensor
 
+    @contextmanager
+    def no_grad(self):
+        """
+        Runs the enclosed code in inference mode: layers do not retain their inputs (or anything else) for backward
+        propagation and BatchNormalization normalizes with its running statistics without updating them. The previous
+        mode is restored on exit.
+        """
+        training = self.training
+        self.training = False
+        try:
+            yield self
+        finally:
+            self.training = training
+
+    def predict(self, x: xp.ndarray, batch_size: int = 1024, out: xp.ndarray = None) -> xp.ndarray:
+        """
+        Computes the outputs of the model for all samples of x, without the training machinery: no gradients, no loss and
+        no metrics. The samples are processed in chunks of batch_size, so only the activations of one chunk are held in
+        memory at a time, and the results are written into a single output array, which is allocated once (after the
+        first chunk, when the output shape is known) unless it is provided as out. x may be any array supporting slicing,
+        for example a memory-mapped file, or a sparse matrix.
+        """
+        n = x.shape[0]
+        with self.no_grad():
+            for start in range(0, max(n, 1), batch_size):
+                chunk = x[start: start + batch_size]
+                if not issparse(chunk):
+                    chunk = xp.asarray(chunk)
+                if xp.issubdtype(chunk.dtype, xp.floating):
+                    chunk = chunk.astype(self.dtype, copy=False)
+
+                y = self(chunk)
+                if out is None:
+                    out = xp.empty((n, ) + y.shape[1:], dtype=y.dtype)
+                out[start: start + chunk.shape[0]] = y
+
+        return out
+
     def backward(self, dEdY: xp.ndarray) -> xp.ndarray:
+        if self._segment_inputs:
+            return self._checkpointed_backward(dEdY)
+
+        profiler = self.profiler
+        start = None if profiler is None else profiler.clock()
         dEdX_next = dEdY
         for i in reversed(range(len(self._layers))):
             dEdX_next = self._layers[i].backward(dEdX_next)
+            if profiler is not None:
+                start = profiler.record(_layer_label(i, self._layers[i]), 'backward', start)
+
+        return dEdX_next
+
+    def _checkpointed_forward(self, input_tensor: xp.ndarray) -> xp.ndarray:
+        profiler = self.profiler
+        clock = None if profiler is None else profiler.clock()
+        segments = self._segments()
+        self._segment_inputs = []
+        for k, (start, end) in enumerate(segments):
+            self._segment_inputs.append(input_tensor)
+            for i in range(start, end):
+                input_tensor = self._layers[i].forward(input_tensor)
+                if profiler is not None:
+                    clock = profiler.record(_layer_label(i, self._layers[i]), 'forward', clock)
+            if k < len(segments) - 1:
+                for layer in self._layers[start: end]:
+                    layer.release()
+
+        return input_tensor
 
+    def _checkpointed_backward(self, dEdY: xp.ndarray) -> xp.ndarray:
+        profiler = self.profiler
+        clock = None if profiler is None else profiler.clock()
+        segments = self._segments()
+        dEdX_next = dEdY
+        for k in reversed(range(len(segments))):
+            start, end = segments[k]
+            if k < len(segments) - 1:
+                input_tensor = self._segment_inputs[k]
+                for i in range(start, end):
+                    _set_recomputing(self._layers[i], True)
+                    try:
+                        input_tensor = self._layers[i].forward(input_tensor)
+                    finally:
+                        _set_recomputing(self._layers[i], False)
+                    if profiler is not None:
+                        clock = profiler.record(_layer_label(i, self._layers[i]), 'recompute', clock)
+
+            for i in reversed(range(start, end)):
+                dEdX_next = self._layers[i].backward(dEdX_next)
+                self._layers[i].release()
+                if profiler is not None:
+                    clock = profiler.record(_layer_label(i, self._layers[i]), 'backward', clock)
+            self._segment_inputs[k] = None
+
+        self._segment_inputs = []
         return dEdX_next
 
+    def release(self):
+        super().release()
+        for layer in self._layers:
+            layer.release()
+        self._segment_inputs = []
+
     def update_parameters(self):
+        if not self._param_groups_valid:
+            self._register_parameters()
+
+        profiler = self.profiler
+        start = None if profiler is None else profiler.clock()
+        for optimizer, group in self._param_groups:
+            optimizer.step(group)
+            if profiler is not None:
+                start = profiler.record(type(optimizer).__name__, 'update', start)
+        for master, param, sparse in self._master_copies:
+            if sparse is not None and sparse.active:  # the optimizer changed only these slices
+                key = sparse.key(sparse.indices)
+                param[key] = master[key]
+            else:
+                param[...] = master
+        if profiler is not None and self._master_copies:
+            start = profiler.record('master copies', 'update', start)
+        for layer in self._untracked_adaptive_layers():
+            layer.update_parameters()
+            if profiler is not None:
+                start = profiler.record(layer.name, 'update', start)
+
+    def _register_parameters(self):
+        """
+        Collects the trainable tensors of all layers by optimizer and registers each collection with its optimizer. Groups
+        registered earlier are rebound to the current arrays, so the optimizer state survives changes such as flattening.
+        """
+        collected = {}
+        if self._flat_params is not None and self._flat_optimizer is not None:
+            collected[id(self._flat_optimizer)] = (self._flat_optimizer, [self._flat_params], [self._flat_grads], [None])
+        else:
+            for layer, param, grad in self._trainable_slots():
+                optimizer, params, grads, sparse = collected.setdefault(id(layer._optimizer),
+                                                                        (layer._optimizer, [], [], []))
+                params.append(getattr(layer, param))
+                grads.append(getattr(layer, grad))
+                sparse.append(layer.sparse_gradient(grad))
+
+        previous = {id(optimizer): group for optimizer, group in self._param_groups}
+        self._param_groups = []
+        self._master_copies = []
+        for optimizer, params, grads, sparse in collected.values():
+            if self._master_dtype is not None:
+                masters = [p.astype(self._master_dtype) for p in params]
+                # the SparseGradient tells which slices to copy back, if the optimizer updates only those
+                updated = sparse if optimizer.supports_sparse else [None] * len(params)
+                self._master_copies.extend(zip(masters, params, updated))
+                params = masters
+
+            group = previous.get(id(optimizer))
+            if group is None:
+                group = optimizer.register(params, grads, sparse)
+            elif not group.bound_to(params, grads):
+                group.rebind(params, grads, sparse)
+            self._param_groups.append((optimizer, group))
+
+        self._param_groups_valid = True
+
+    def _untracked_adaptive_layers(self) -> List[AdaptiveObject]:
+        """
+        Adaptive layers that do not list their parameters in `_trainable` update themselves.
+        """
+        layers = []
         for layer in self._layers:
-            if isinstance(layer, AdaptiveObject):
-                layer.update_parameters()
+            if isinstance(layer, Model):
+                layers.extend(layer._untracked_adaptive_layers())
+            elif isinstance(layer, AdaptiveObject) and not layer._trainable:
+                layers.append(layer)
+        return layers
+
+    def _stateful_layers(self) -> List[AdaptiveObject]:
+        layers = []
+        for layer in self._layers:
+            if isinstance(layer, Model):
+                layers.extend(layer._stateful_layers())
+            elif isinstance(layer, AdaptiveObject) and layer._state:
+                layers.append(layer)
+        return layers
 
     def _process_minibatch(self, x: xp.ndarray, y: xp.ndarray) -> Tuple[xp.ndarray, xp.ndarray, float]:
+        if self._data_parallel is not None and self.training:
+            return self._data_parallel.process_minibatch(x, y)
+        return self._forward_backward(x, y)
+
+    def _forward_backward(self, x: xp.ndarray, y: xp.ndarray) -> Tuple[xp.ndarray, xp.ndarray, float]:
         if y.ndim == 1:
             y = y.reshape(-1, 1)
+        if self.micro_batches > 1 and x.shape[0] > 1 and self.training and self._loss is not None:
+            return self._accumulate_gradients(x, y)
 
         output = self.forward(x)
-        l = self._loss(output, y)
         dEdI = None
+        if self._flat and self._flat_params is None and self.training:
+            self.flatten_parameters()
+
+        start = None if self.profiler is None else self.profiler.clock()
         if self.training and self._loss is not None:
-            grad = self._loss.backward(output, y)
+            l, grad = self._loss.value_and_grad(output, y)
+            if self.profiler is not None:
+                self.profiler.record(type(self._loss).__name__, 'loss', start)
             dEdI = self.backward(grad)
+        else:
+            l = self._loss(output, y)
+            if self.profiler is not None:
+                self.profiler.record(type(self._loss).__name__, 'loss', start)
 
         return output, dEdI, l
 
+    def _accumulate_gradients(self, x: xp.ndarray, y: xp.ndarray) -> Tuple[xp.ndarray, None, float]:
+        """
+        Runs the minibatch as micro_batches consecutive micro-batches, so the activations of only one micro-batch are held
+        in memory. The gradient of the loss of micro-batch k, which has n_k of the n samples, is scaled by n_k / n and the
+        parameter gradients are summed in place, which leaves the gradient of the mean loss over the whole minibatch for
+        a single optimizer step. Except for layers that compute statistics over the batch (BatchNormalization), the
+        result equals processing the minibatch at once up to the order of floating point additions. The summed gradients
+        are dense, so optimizers update sparse gradients (see SparseGradient) in full after accumulation.
+        """
+        n = x.shape[0]
+        bounds = [n * k // self.micro_batches for k in range(self.micro_batches + 1)]
+        ranges = [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+        outputs = None
+        loss = 0.0
+        for k, (start, end) in enumerate(ranges):
+            output = self.forward(x[start: end])
+            if self._flat and self._flat_params is None:
+                self.flatten_parameters()
+
+            clock = None if self.profiler is None else self.profiler.clock()
+            l, grad = self._loss.value_and_grad(output, y[start: end])
+            grad *= (end - start) / n
+            if self.profiler is not None:
+                self.profiler.record(type(self._loss).__name__, 'loss', clock)
+            self.backward(grad)
+            loss += l * (end - start) / n
+
+            if outputs is None:
+                outputs = self._buffer('outputs', (n,) + output.shape[1:], output.dtype)
+            outputs[start: end] = output
+
+            grads = [self._flat_grads] if self._flat_grads is not None else \
+                [getattr(layer, grad) for layer, _, grad in self._trainable_slots()]
+            if len(self._accumulators) != len(grads) or \
+                    any(a.shape != g.shape or a.dtype != g.dtype for a, g in zip(self._accumulators, grads)):
+                self._accumulators = [xp.empty_like(g) for g in grads]
+            for accumulator, g in zip(self._accumulators, grads):
+                if k == 0:
+                    accumulator[...] = g
+                elif k < len(ranges) - 1:
+                    accumulator += g
+                else:
+                    g += accumulator  # the sum ends up in the gradients, where the optimizer expects it
+
+        self._reset_sparse_gradients()
+        return outputs, None, loss
+
+    def _reset_sparse_gradients(self):
+        """
+        Marks the gradients described by a SparseGradient as dense, after they were summed over several passes in place.
+        """
+        for layer, _, grad in self._trainable_slots():
+            if layer.sparse_gradient(grad) is not None:
+                layer.sparse_gradient(grad).reset()
+
     def _epoch(self, data: Dataset, metrics: List[Metric] = []) -> float:
+        profiler = self.profiler
+        epoch_start = start = None if profiler is None else profiler.clock()
         loss = 0.0
         batch_num = 0
         for batch_x, batch_y in data:
+            if profiler is not None:
+                profiler.record('next minibatch', 'data', start)
             if batch_y.ndim == 1:
                 batch_y = batch_y.reshape(-1, 1)
             batch_num += 1
@@ -97,12 +598,19 @@ class Model(AdaptiveObject):
                 self.update_parameters()
             loss += l  # error function shown as average in each example
 
-            for m in metrics:
-                m.calculate(output, batch_y)
+            if profiler is not None:
+                start = profiler.clock()
+            update_metrics(metrics, output, batch_y)
+            if profiler is not None:
+                start = profiler.record('metrics', 'metrics', start)
 
         loss /= batch_num
+        if self._data_parallel is not None and self.training:
+            self._data_parallel.sync_state()
         for m in metrics:
             m.calculate_for_epoch()
+        if profiler is not None:
+            profiler.record('training epoch' if self.training else 'evaluation epoch', 'epoch', epoch_start)
         return loss
 
     def fit(self,
@@ -110,22 +618,36 @@ class Model(AdaptiveObject):
             val_data: Union[Tuple[xp.ndarray, xp.ndarray], Dataset] = None,
             batch_size: int = 64, max_epochs: int = 100,
             print_every: int = 5, eps: float = 1e-6,
-            metrics: List[Metric] = []):
+            metrics: List[Metric] = [], workers: int = 1, save: bool = True, micro_batches: int = None):
         """
         Training stops after at most max_epochs epochs, or earlier if the difference in loss between two consecutive epochs
-        falls below eps.
+        falls below eps. The parameters are then written with save_params, unless save is False.
+
+        With workers > 1, every minibatch is split across that many processes (see DataParallel). micro_batches sets the
+        number of micro-batches each minibatch is processed in (see _accumulate_gradients), on every worker.
         """
+        if micro_batches is not None:
+            self.micro_batches = micro_batches
 
         if isinstance(train_data, tuple):
             train_data = Dataset(train_data[0], train_data[1])
         train_data.batch_size = batch_size
+        self._set_data_dtype(train_data)
 
         if val_data is not None and isinstance(val_data, tuple):
             val_data = Dataset(val_data[0], val_data[1], shuffle=False)
 
         if val_data is not None:
             val_data.batch_size = batch_size
+            self._set_data_dtype(val_data)
+
+        if workers > 1:
+            with DataParallel(self, workers, train_data):
+                return self._train(train_data, val_data, max_epochs, print_every, eps, metrics, save)
+        return self._train(train_data, val_data, max_epochs, print_every, eps, metrics, save)
 
+    def _train(self, train_data: Dataset, val_data: Dataset, max_epochs: int, print_every: int, eps: float,
+               metrics: List[Metric], save: bool):
         prev_loss = None
         prev_val_loss = None
 
@@ -148,7 +670,8 @@ class Model(AdaptiveObject):
                     if prev_val_loss < val_loss:
                         self.training = False
                         print("Training time = " + str(time.time() - start_time) + ' seconds')
-                        self.save_params()
+                        if save:
+                            self.save_params()
                         return
                     prev_val_loss = val_loss
 
@@ -157,14 +680,35 @@ class Model(AdaptiveObject):
                     self.training = False
                     self.print_progress(loss, epoch + 1, "Training", metrics)
                     print("Training time = " + str(time.time() - start_time) + ' seconds')
-                    self.save_params()
+                    if save:
+                        self.save_params()
                     return
 
             prev_loss = loss
 
         self.training = False
         print("Training time = " + str(time.time() - start_time) + ' seconds')
-        self.save_params()
+        if save:
+            self.save_params()
+
+    def fit_hogwild(self,
+                    train_data: Union[Tuple[xp.ndarray, xp.ndarray], Dataset],
+                    batch_size: int = 64, max_epochs: int = 100,
+                    print_every: int = 5, workers: int = 2, save: bool = True) -> Dict[str, object]:
+        """
+        Trains asynchronously on workers processes that update shared parameters without locks (see Hogwild), for
+        max_epochs epochs. Returns the loss of every epoch and the throughput in samples per second.
+        """
+        if isinstance(train_data, tuple):
+            train_data = Dataset(train_data[0], train_data[1])
+        train_data.batch_size = batch_size
+        self._set_data_dtype(train_data)
+
+        report = Hogwild(self, workers).fit(train_data, max_epochs, print_every)
+        print("Training time = " + str(report['time']) + ' seconds')
+        if save:
+            self.save_params()
+        return report
 
     def evaluate(self, test_data: Union[Tuple[xp.ndarray, xp.ndarray], Dataset], metrics: List[Metric] = []) -> float:
         """
@@ -174,6 +718,7 @@ class Model(AdaptiveObject):
 
         if isinstance(test_data, tuple):
             test_data = Dataset(test_data[0], test_data[1], 64)
+        self._set_data_dtype(test_data)
         loss = self._epoch(test_data, metrics)
         print("Test set loss = " + str(loss))
 
@@ -183,6 +728,10 @@ class Model(AdaptiveObject):
 
         return loss
 
+    def _set_data_dtype(self, data: Dataset):
+        if data.dtype is None:
+            data.dtype = self.dtype
+
     def print_progress(self, loss: float, epoch: int, prefix: str = "Training", metrics: List[Metric] = []):
         print("{}:\tEpoch: {}, loss: {}.".format(prefix, epoch, loss))
 
@@ -194,9 +743,29 @@ class Model(AdaptiveObject):
         for l in self._layers:
             if isinstance(l, AdaptiveObject):
                 l.set_optimizer(optimizer, force)
+        if self._flat_params is not None:
+            self._flat_optimizer = self._shared_optimizer()
+        self._param_groups_valid = False
 
     def add_layer(self, layer: Function):
+        if self._dtype is not None:
+            layer.dtype = self._dtype
+        layer.workspace = self._workspace
         self._layers.append(layer)
+        self._param_groups_valid = False
 
     def set_loss(self, loss_function: LossFunction):
+        loss_function.workspace = self._workspace
         self._loss = loss_function
+
+
+def _set_recomputing(layer: Function, val: bool):
+    layer._recomputing = val
+    if isinstance(layer, Model):
+        for sublayer in layer._layers:
+            _set_recomputing(sublayer, val)
+
+
+def _layer_label(index: int, layer: Function) -> str:
+    name = layer.name if layer.name not in (None, 'unnamed') else type(layer).__name__
+    return '{} {}'.format(index, name)
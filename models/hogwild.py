@@ -0,0 +1,126 @@
+import multiprocessing
+import threading
+import time
+from typing import Dict
+
+import numpy
+
+from backend.backend import xp
+from backend.shared_memory import fork_shared_array, limit_blas_threads
+from optimizers.momentum import Momentum
+from optimizers.sgd import SGD
+from utils.dataset import Dataset
+
+
+class Hogwild:
+    """
+    Asynchronous lock-free training of a Model on several CPU processes (see Model.fit_hogwild), after Hogwild! by Niu et
+    al.
+
+    The parameters of the model are flattened into memory shared by all processes and num_workers - 1 processes are
+    forked. The training data is split into num_workers contiguous shards and every process, the main process included,
+    trains on its own shard: it computes the gradient of a minibatch into its own gradient buffer and applies the
+    optimizer step directly to the shared parameters, without locks and without waiting for the others. Updates of
+    different processes may interleave and overwrite each other; for sparse or weakly coupled gradients this costs
+    little accuracy, while the throughput grows almost linearly with the number of cores. The result is not
+    deterministic.
+
+    Only SGD and Momentum are supported, because their updates are plain additions to the parameters (the velocity of
+    Momentum is kept by every process for itself). Models with non-trainable state, such as BatchNormalization, are
+    not supported either. The processes wait for each other only at the end of every epoch, to report the loss.
+    """
+
+    def __init__(self, model, num_workers: int):
+        if xp is not numpy:
+            raise Exception("Hogwild training is only supported with the NumPy backend!")
+        if num_workers < 1:
+            raise ValueError("Hogwild training needs at least 1 worker")
+        if model._stateful_layers():
+            raise Exception("Hogwild training does not support layers with non-trainable state!")
+
+        self.model = model
+        self.num_workers = num_workers
+        self._barrier = None
+        self._losses = None
+        self._batches = None
+
+    def fit(self, data: Dataset, max_epochs: int = 100, print_every: int = 5) -> Dict[str, object]:
+        """
+        Trains for max_epochs epochs and returns the mean minibatch loss of every epoch ('losses'), the training time in
+        seconds ('time') and the number of samples processed per second ('samples_per_second').
+        """
+        model = self.model
+        training = model.training
+        model.training = False
+        sample_x, _ = data.gather(slice(0, 1))
+        model.forward(sample_x)
+
+        optimizers = {id(layer._optimizer): layer._optimizer for layer, _, _ in model._trainable_slots()}
+        if any(not isinstance(optimizer, (SGD, Momentum)) for optimizer in optimizers.values()):
+            raise Exception("Hogwild training supports only the SGD and Momentum optimizers!")
+
+        flat_params = model.flat_parameters
+        size = sum(getattr(layer, param).size for layer, param, _ in model._trainable_slots())
+        params = fork_shared_array((size,), model.dtype if flat_params is None else flat_params.dtype)
+        model.flatten_parameters(params)
+
+        bounds = numpy.linspace(0, len(data), self.num_workers + 1).astype(int)
+        shards = [Dataset(data.x[bounds[k]: bounds[k + 1]], data.y[bounds[k]: bounds[k + 1]], data.batch_size,
+                          data.shuffle, data.dtype) for k in range(self.num_workers)]
+        seeds = numpy.random.randint(0, 2 ** 31 - 1, size=self.num_workers)
+
+        self._losses = fork_shared_array((max_epochs, self.num_workers), numpy.float64)
+        self._batches = fork_shared_array((max_epochs, self.num_workers), numpy.int64)
+        context = multiprocessing.get_context('fork')
+        self._barrier = context.Barrier(self.num_workers)
+
+        thread_limits = limit_blas_threads() if self.num_workers > 1 else None
+        model.training = True
+        start_time = time.time()
+        processes = [context.Process(target=self._work, args=(rank, shards[rank], seeds[rank], max_epochs),
+                                     daemon=True) for rank in range(1, self.num_workers)]
+        try:
+            for process in processes:
+                process.start()
+            losses = self._train(0, shards[0], max_epochs, print_every)
+        except BaseException:
+            self._barrier.abort()
+            raise
+        finally:
+            for process in processes:
+                process.join()
+            if thread_limits is not None:
+                thread_limits.restore_original_limits()
+            model.training = training
+            model.flatten_parameters()
+
+        elapsed = time.time() - start_time
+        return {'losses': losses, 'time': elapsed, 'samples_per_second': len(data) * max_epochs / elapsed}
+
+    def _work(self, rank: int, shard: Dataset, seed: int, max_epochs: int):
+        numpy.random.seed(seed)
+        self.model.profiler = None  # only the main process records its share of the training
+        try:
+            self._train(rank, shard, max_epochs)
+        except threading.BrokenBarrierError:
+            pass
+        except BaseException:
+            self._barrier.abort()
+            raise
+
+    def _train(self, rank: int, shard: Dataset, max_epochs: int, print_every: int = 0) -> list:
+        model = self.model
+        losses = []
+        for epoch in range(max_epochs):
+            for batch_x, batch_y in shard:
+                _, _, loss = model._forward_backward(batch_x, batch_y)
+                model.update_parameters()
+                self._losses[epoch, rank] += loss
+                self._batches[epoch, rank] += 1
+            self._barrier.wait()
+
+            if rank == 0:
+                losses.append(float(self._losses[epoch].sum() / max(self._batches[epoch].sum(), 1)))
+                if print_every and (epoch + 1) % print_every == 0:
+                    model.print_progress(losses[-1], epoch + 1, "Hogwild training")
+        return losses
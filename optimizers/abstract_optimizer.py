@@ -1,12 +1,86 @@
 from abc import ABC, abstractmethod
+from typing import Dict, List
 
 from backend.backend import xp
+from optimizers.sparse_gradient import SparseGradient
+
+
+class ParamGroup:
+    """
+    A group of parameters registered with an optimizer, together with their gradients and the optimizer state of every
+    tensor (moving averages, step counter, ...). The group keeps references to the arrays, so once registered the update
+    needs no lookups: the gradients are expected to be written into the same arrays before every step.
+
+    Scratch buffers shared by all tensors of the group are allocated at registration. Optimizers compute their updates
+    in these buffers with `out` parameters instead of creating temporary arrays.
+
+    If a model replaces its arrays, for example when it moves its parameters into one flat buffer, the group is rebound
+    to the new arrays with rebind. The state is carried over as long as the number of elements is unchanged.
+
+    sparse optionally gives the SparseGradient describing each gradient (None for gradients that are always dense).
+    """
+
+    def __init__(self, optimizer: 'Optimizer', params: List[xp.ndarray], grads: List[xp.ndarray],
+                 sparse: List[SparseGradient] = None):
+        self.optimizer = optimizer
+        self.t = 0
+        self.state: List[Dict[str, xp.ndarray]] = []
+        self._bind(params, grads, sparse)
+        self.state = [optimizer._init_state(p) for p in self.params]
+
+    def _bind(self, params: List[xp.ndarray], grads: List[xp.ndarray], sparse: List[SparseGradient] = None):
+        self.params = list(params)
+        self.grads = list(grads)
+        self.sparse = list(sparse) if sparse is not None else [None] * len(self.params)
+
+        size = max([p.size for p in self.params], default=0)
+        dtype = xp.result_type(*self.params) if self.params else float
+        buffers = [xp.empty(size, dtype=dtype) for _ in range(self.optimizer._num_scratch)]
+        self.scratch = [[b[:p.size].reshape(p.shape) for b in buffers] for p in self.params]
+
+    def bound_to(self, params: List[xp.ndarray], grads: List[xp.ndarray]) -> bool:
+        return len(params) == len(self.params) and \
+               all(a is b for a, b in zip(params, self.params)) and all(a is b for a, b in zip(grads, self.grads))
+
+    def rebind(self, params: List[xp.ndarray], grads: List[xp.ndarray], sparse: List[SparseGradient] = None):
+        old_state = self.state
+        old_size = sum(p.size for p in self.params)
+        for state in old_state:
+            self.optimizer._finish_lazy(state, self.t)
+        self._bind(params, grads, sparse)
+
+        if sum(p.size for p in self.params) != old_size or not old_state:
+            self.state = [self.optimizer._init_state(p) for p in self.params]
+            self.t = 0
+            return
+
+        # the elements keep their order, so the state of all tensors is concatenated and split along the new shapes
+        self.state = [dict() for _ in self.params]
+        for key in old_state[0]:
+            flat = xp.concatenate([s[key].ravel() for s in old_state])
+            offset = 0
+            for i, p in enumerate(self.params):
+                self.state[i][key] = flat[offset: offset + p.size].reshape(p.shape).copy()
+                offset += p.size
 
 
 class Optimizer(ABC):
     """
-    The optimizer’s goal is to update the parameters of an AdaptiveObject (see that class). Every concrete optimizer must
-    implement update_parameters, which receives parameters and their gradients and updates them accordingly.
+    The optimizer’s goal is to update the parameters of an AdaptiveObject (see that class). Parameters are registered
+    once with register, which returns a ParamGroup, and every call to step updates all tensors of the group in place.
+    Concrete optimizers implement _init_state, which creates the state of one tensor, and _update, which performs the
+    update of one tensor using only in-place operations and the scratch buffers of the group. update_parameters is kept
+    for updating a single tensor without registering it first.
+
+    Optimizers whose update of a parameter slice depends only on the gradient of that slice set supports_sparse and
+    implement _sparse_update(param, grad, state, scratch, t), which receives the SparseGradient instead of the dense
+    gradient; they update only the slices named by an active SparseGradient. All others update the whole tensor from
+    the dense gradient, which SparseGradient keeps exact. State that decays where the gradient is zero (the moving
+    averages of RMSProp, Adam and Momentum) is updated lazily: the step at which every slice was last updated is kept in
+    state['last'], and when the slice receives a gradient again its averages are first decayed by βᵏ for the k steps it
+    missed (_lazy_steps). Before a dense update of the whole tensor, and before a group is rebound, every slice is
+    brought up to date at once with _finish_lazy, which calls the _decay of the optimizer. The cost of a step is then
+    proportional to the number of slices in the minibatch, not to the size of the tensor.
 
     Regarding neural-network optimization:
 
@@ -21,9 +95,69 @@ class Optimizer(ABC):
     useful if the optimizer can learn faster from such rare but informative signals.
     """
 
+    _num_scratch = 1  # number of scratch buffers needed by _update
+    supports_sparse = False
+
     def __init__(self, lr: float):
         self.lr = lr
+        self._single_tensor_groups: Dict[int, ParamGroup] = {}
+
+    def register(self, params: List[xp.ndarray], grads: List[xp.ndarray],
+                 sparse: List[SparseGradient] = None) -> ParamGroup:
+        return ParamGroup(self, params, grads, sparse)
+
+    def step(self, group: ParamGroup):
+        group.t += 1
+        for param, grad, sparse, state, scratch in zip(group.params, group.grads, group.sparse, group.state,
+                                                       group.scratch):
+            if self.supports_sparse and sparse is not None and sparse.active:
+                self._sparse_update(param, sparse, state, scratch, group.t)
+            else:
+                self._update(param, grad, state, scratch, group.t)
 
-    @abstractmethod
     def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
+        # the group holds a reference to params, so its id cannot be reused by another array while the entry exists
+        group = self._single_tensor_groups.get(id(params))
+        if group is None:
+            group = self.register([params], [grad])
+            self._single_tensor_groups[id(params)] = group
+        group.grads[0] = grad
+        self.step(group)
+        return params
+
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {}
+
+    @staticmethod
+    def _lazy_steps(param: xp.ndarray, grad: SparseGradient, state: Dict[str, xp.ndarray], t: int) -> xp.ndarray:
+        """
+        The number of steps each slice of grad.indices went without an update before step t, shaped to broadcast against
+        grad.values. The slices are recorded as updated at step t.
+        """
+        last = state.get('last')
+        if last is None:  # all earlier steps, if any, were dense and updated every slice
+            shape = (param.shape[grad.axis],) + (1,) * (param.ndim - grad.axis - 1)
+            last = state['last'] = xp.full(shape, t - 1, dtype=xp.int64)
+        skipped = t - 1 - last[grad.indices]
+        last[grad.indices] = t
+        return skipped
+
+    def _finish_lazy(self, state: Dict[str, xp.ndarray], t: int):
+        """
+        Brings the state of a tensor that was updated lazily up to date with step t: every slice is decayed for the steps
+        it missed since its last update, and state['last'] is dropped, as after a dense update of all slices.
+        """
+        last = state.pop('last', None)
+        if last is not None:
+            self._decay(state, t - last)
+
+    def _decay(self, state: Dict[str, xp.ndarray], steps: xp.ndarray):
+        """
+        Applies to the state that decays where the gradient is zero the decay of the given numbers of steps, which
+        broadcast against the tensor. Optimizers without such state have nothing to do.
+        """
+        pass
+
+    @abstractmethod
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
         pass
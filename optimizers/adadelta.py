@@ -1,6 +1,6 @@
-from typing import Dict
+from typing import Dict, List
 
-from backend.backend import xp, address
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
 
 
@@ -24,22 +24,36 @@ class Adadelta(Optimizer):
     wₜ₊₁ = wₜ + Δwₜ.
     """
 
+    _num_scratch = 2
+
     def __init__(self, beta: float = 0.9):
         super().__init__(0)
-        self.history: Dict[int, Dict[str, xp.ndarray]] = {}
         self.eps = 1e-6
         self.beta = beta
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        a = address(params)
-        if a not in self.history:
-            self.history[a] = {}
-            self.history[a]["E_g_sq"] = xp.zeros_like(grad)
-            self.history[a]["E_update_sq"] = xp.zeros_like(grad)
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {"E_g_sq": xp.zeros_like(param), "E_update_sq": xp.zeros_like(param)}
+
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        E_g_sq, E_update_sq = state["E_g_sq"], state["E_update_sq"]
+        step, tmp = scratch
+
+        xp.multiply(grad, grad, out=step)
+        step *= 1 - self.beta
+        E_g_sq *= self.beta
+        E_g_sq += step
+
+        # step = −Δwₜ = RMS[Δw]ₜ₋₁ * gₜ / RMS[g]ₜ
+        xp.add(E_g_sq, self.eps, out=step)
+        xp.sqrt(step, out=step)
+        xp.divide(grad, step, out=step)
+        xp.add(E_update_sq, self.eps, out=tmp)
+        xp.sqrt(tmp, out=tmp)
+        step *= tmp
 
-        self.history[a]["E_g_sq"] = self.beta * self.history[a]["E_g_sq"] + (1 - self.beta) * grad * grad
-        update = - xp.sqrt(self.history[a]["E_update_sq"] + self.eps) * grad / xp.sqrt(self.history[a]["E_g_sq"] + self.eps)
-        self.history[a]["E_update_sq"] = self.beta * self.history[a]["E_update_sq"] + (1 - self.beta) * update * update
-        params += update
+        xp.multiply(step, step, out=tmp)
+        tmp *= 1 - self.beta
+        E_update_sq *= self.beta
+        E_update_sq += tmp
 
-        return params
+        param -= step
@@ -1,7 +1,8 @@
-from typing import Dict
+from typing import Dict, List
 
-from backend.backend import xp, address
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
+from optimizers.sparse_gradient import SparseGradient
 
 
 class Adagrad(Optimizer):
@@ -18,22 +19,40 @@ class Adagrad(Optimizer):
     Larger values of Gᵢᵢ reduce the influence of gradient component gᵢ, meaning frequently updated parameters get smaller
     steps. eps (typically 1e−8) ensures numerical stability. The drawback is that G grows indefinitely, eventually making
     learning extremely slow. In practice, G can be stored as a vector with the same shape as the parameters.
+
+    Where the gradient is zero neither G nor the parameter changes, so for a SparseGradient only the slices it names are
+    updated, with the same result as the dense update.
     """
 
+    supports_sparse = True
+
     def __init__(self, lr: float = 0.01):
         super().__init__(lr)
-        self.g_sq: Dict[int, xp.ndarray] = {}
         self.eps = 1e-8
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        a = address(params)
-
-        if a not in self.g_sq:
-            self.g_sq[a] = xp.zeros_like(grad)
-
-        g_sq = self.g_sq[a]
-        g_sq += grad*grad
-        self.g_sq[a] = g_sq
-        params -= self.lr * grad / xp.sqrt(g_sq + self.eps)
-
-        return params
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {"g_sq": xp.zeros_like(param)}
+
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        g_sq, step = state["g_sq"], scratch[0]
+        xp.multiply(grad, grad, out=step)
+        g_sq += step
+
+        xp.add(g_sq, self.eps, out=step)
+        xp.sqrt(step, out=step)
+        xp.divide(grad, step, out=step)
+        step *= self.lr
+        param -= step
+
+    def _sparse_update(self, param: xp.ndarray, grad: SparseGradient, state: Dict[str, xp.ndarray],
+                       scratch: List[xp.ndarray], t: int):
+        key, values = grad.key(grad.indices), grad.values
+        step = scratch[0].reshape(-1)[:values.size].reshape(values.shape)
+        g_sq = state["g_sq"][key] + values * values
+        state["g_sq"][key] = g_sq
+
+        xp.add(g_sq, self.eps, out=step)
+        xp.sqrt(step, out=step)
+        xp.divide(values, step, out=step)
+        step *= self.lr
+        param[key] -= step
@@ -1,7 +1,8 @@
-from typing import Union, Dict
+from typing import Dict, List
 
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
-from backend.backend import xp, address
+from optimizers.sparse_gradient import SparseGradient
 
 
 class Adam(Optimizer):
@@ -22,34 +23,85 @@ class Adam(Optimizer):
     wₜ₊₁ = wₜ − α m̂ₜ / (sqrt(v̂ₜ) + eps),
 
     where eps ≈ 1e−8 for numerical stability, and β₂ is typically 0.999.
+
+    With lazy=True, for a SparseGradient only the slices it names are updated ("lazy Adam"). A slice that missed k steps
+    has m and v multiplied by β₁ᵏ and β₂ᵏ before the update, so both moments are the same as with dense updates, and the
+    bias correction uses the global step t. What is skipped is the movement of the parameter during the steps without
+    gradient, driven only by the decaying m. For large embedding tables this makes the cost of a step proportional to
+    the number of rows in the minibatch instead of the size of the table.
     """
 
-    def __init__(self, lr: float = 0.002, beta_1: float = 0.9, beta_2: float = 0.999, nesterov: bool = False):
+    def __init__(self, lr: float = 0.002, beta_1: float = 0.9, beta_2: float = 0.999, nesterov: bool = False,
+                 lazy: bool = False):
         super().__init__(lr)
         self.beta_1 = beta_1
         self.beta_2 = beta_2
-        self.history: Dict[int, Dict[str, Union[xp.ndarray, int]]] = {}
         self.eps = 1e-8
         self.nesterov = nesterov
+        self._num_scratch = 2 if nesterov else 1
+        self.supports_sparse = lazy
+
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {"m": xp.zeros_like(param), "v": xp.zeros_like(param)}
+
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        m, v = state["m"], state["v"]
+        step = scratch[0]
+        self._finish_lazy(state, t - 1)
+
+        xp.multiply(grad, 1 - self.beta_1, out=step)
+        m *= self.beta_1
+        m += step
+        xp.multiply(grad, grad, out=step)
+        step *= 1 - self.beta_2
+        v *= self.beta_2
+        v += step
+
+        numerator = m
+        if self.nesterov:
+            numerator = scratch[1]
+            xp.multiply(grad, 1 - self.beta_1, out=numerator)
+            xp.multiply(m, self.beta_1, out=step)
+            numerator += step
+
+        # α m̂ₜ / (sqrt(v̂ₜ) + eps) = α / (1 − β₁ᵗ) · mₜ / (sqrt(vₜ) / sqrt(1 − β₂ᵗ) + eps)
+        xp.sqrt(v, out=step)
+        step /= (1 - self.beta_2 ** t) ** 0.5
+        step += self.eps
+        xp.divide(numerator, step, out=step)
+
+        step *= self.lr / (1 - self.beta_1 ** t)
+        param -= step
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        a = address(params)
-        if a not in self.history:
-            self.history[a] = {}
-            self.history[a]["t"] = 0
-            self.history[a]["v"] = xp.zeros_like(grad)
-            self.history[a]["m"] = xp.zeros_like(grad)
+    def _decay(self, state: Dict[str, xp.ndarray], steps: xp.ndarray):
+        state["m"] *= self.beta_1 ** steps
+        state["v"] *= self.beta_2 ** steps
 
-        self.history[a]["t"] += 1
-        self.history[a]["m"] = self.beta_1 * self.history[a]["m"] + (1 - self.beta_1) * grad
-        self.history[a]["v"] = self.beta_2 * self.history[a]["v"] + (1 - self.beta_2) * grad * grad
+    def _sparse_update(self, param: xp.ndarray, grad: SparseGradient, state: Dict[str, xp.ndarray],
+                       scratch: List[xp.ndarray], t: int):
+        key, values = grad.key(grad.indices), grad.values
+        step = scratch[0].reshape(-1)[:values.size].reshape(values.shape)
+        skipped = self._lazy_steps(param, grad, state, t) + 1
+        m, v = state["m"][key], state["v"][key]
 
-        m_corr = self.history[a]["m"] / (1 - xp.power(self.beta_1, self.history[a]["t"]))
-        v_corr = self.history[a]["v"] / (1 - xp.power(self.beta_2, self.history[a]["t"]))
+        m *= self.beta_1 ** skipped
+        xp.multiply(values, 1 - self.beta_1, out=step)
+        m += step
+        v *= self.beta_2 ** skipped
+        xp.multiply(values, values, out=step)
+        step *= 1 - self.beta_2
+        v += step
+        state["m"][key], state["v"][key] = m, v
 
+        numerator = m
         if self.nesterov:
-            beta_t = xp.power(self.beta_1, self.history[a]["t"])
-            params -= self.lr * (self.beta_1 * m_corr + (1-self.beta_1)*grad/(1 - beta_t)) / (xp.sqrt(v_corr) + self.eps)
-        else:
-            params -= self.lr * m_corr / (xp.sqrt(v_corr) + self.eps)
-        return params
+            numerator = m * self.beta_1
+            numerator += (1 - self.beta_1) * values
+
+        xp.sqrt(v, out=step)
+        step /= (1 - self.beta_2 ** t) ** 0.5
+        step += self.eps
+        xp.divide(numerator, step, out=step)
+
+        step *= self.lr / (1 - self.beta_1 ** t)
+        param[key] -= step
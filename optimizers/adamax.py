@@ -1,7 +1,7 @@
-from typing import Union, Dict
+from typing import Dict, List
 
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
-from backend.backend import xp, address
 
 
 class AdaMax(Optimizer):
@@ -28,23 +28,23 @@ class AdaMax(Optimizer):
         super().__init__(lr)
         self.beta_1 = beta_1
         self.beta_2 = beta_2
-        self.history: Dict[int, Dict[str, Union[xp.ndarray, int]]] = {}
         self.eps = 1e-8
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        a = address(params)
-        if a not in self.history:
-            self.history[a] = {}
-            self.history[a]["t"] = 0
-            self.history[a]["v"] = xp.zeros_like(grad)
-            self.history[a]["m"] = xp.zeros_like(grad)
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {"m": xp.zeros_like(param), "v": xp.zeros_like(param)}
 
-        self.history[a]["t"] += 1
-        self.history[a]["m"] = self.beta_1 * self.history[a]["m"] + (1 - self.beta_1) * grad
-        self.history[a]["v"] = xp.maximum(self.beta_2 * self.history[a]["v"], xp.abs(grad))
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        m, v = state["m"], state["v"]
+        step = scratch[0]
 
-        m_corr = self.history[a]["m"] / (1 - xp.power(self.beta_1, self.history[a]["t"]))
+        xp.multiply(grad, 1 - self.beta_1, out=step)
+        m *= self.beta_1
+        m += step
+        xp.abs(grad, out=step)
+        v *= self.beta_2
+        xp.maximum(v, step, out=v)
 
-        params -= self.lr * m_corr / (self.history[a]["v"] + self.eps)
-
-        return params
+        xp.add(v, self.eps, out=step)
+        xp.divide(m, step, out=step)
+        step *= self.lr / (1 - self.beta_1 ** t)
+        param -= step
@@ -1,7 +1,7 @@
-from typing import Union, Dict
+from typing import Dict, List
 
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
-from backend.backend import xp, address
 
 
 class AMSGrad(Optimizer):
@@ -28,28 +28,28 @@ class AMSGrad(Optimizer):
         super().__init__(lr)
         self.beta_1 = beta_1
         self.beta_2 = beta_2
-        self.history: Dict[int, Dict[str, Union[xp.ndarray, int]]] = {}
         self.eps = 1e-8
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        a = address(params)
-        if a not in self.history:
-            self.history[a] = {}
-            self.history[a]["t"] = 0
-            self.history[a]["v"] = xp.zeros_like(grad)
-            self.history[a]["v_hat"] = xp.zeros_like(grad)
-            self.history[a]["m"] = xp.zeros_like(grad)
-
-        self.history[a]["t"] += 1
-        m = self.history[a]["m"]
-        v = self.history[a]["v"]
-        self.history[a]["m"] = self.beta_1 * m + (1 - self.beta_1) * grad
-        self.history[a]["v"] = self.beta_2 * v + (1 - self.beta_2) * grad * grad
-
-        m_corr = self.history[a]["m"] / (1 - xp.power(self.beta_1, self.history[a]["t"]))
-        v_corr = xp.maximum(self.history[a]["v_hat"], self.history[a]["v"])
-        self.history[a]["v_hat"] = v_corr
-
-        params -= self.lr * m_corr / (xp.sqrt(v_corr) + self.eps)
-
-        return params
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {"m": xp.zeros_like(param), "v": xp.zeros_like(param), "v_hat": xp.zeros_like(param)}
+
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        m, v = state["m"], state["v"]
+        step = scratch[0]
+
+        xp.multiply(grad, 1 - self.beta_1, out=step)
+        m *= self.beta_1
+        m += step
+        xp.multiply(grad, grad, out=step)
+        step *= 1 - self.beta_2
+        v *= self.beta_2
+        v += step
+
+        v_hat = state["v_hat"]
+        xp.maximum(v_hat, v, out=v_hat)
+
+        xp.sqrt(v_hat, out=step)
+        step += self.eps
+        xp.divide(m, step, out=step)
+        step *= self.lr / (1 - self.beta_1 ** t)
+        param -= step
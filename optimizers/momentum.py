@@ -1,7 +1,8 @@
-from typing import Dict
+from typing import Dict, List
 
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
-from backend.backend import xp, address
+from optimizers.sparse_gradient import SparseGradient
 
 
 class Momentum(Optimizer):
@@ -27,26 +28,54 @@ class Momentum(Optimizer):
     gₜ = ∇J(wₜ),
     vₜ = βvₜ₋₁ + αgₜ,
     wₜ₊₁ = wₜ − (βvₜ + αgₜ).
+
+    LAZY VARIANT
+    With lazy=True, for a SparseGradient only the slices it names are updated. A slice that missed k steps has its
+    velocity multiplied by βᵏ before the update, so v is the same as with dense updates, but the parameter does not keep
+    moving with the decaying velocity during the steps without gradient. This is the usual choice for large embedding
+    tables, where the dense update would touch every row on every step.
     """
 
-    def __init__(self, lr: float = 0.005, beta: float = 0.9, nesterov: bool = False):
+    def __init__(self, lr: float = 0.005, beta: float = 0.9, nesterov: bool = False, lazy: bool = False):
         super().__init__(lr)
         self.beta = beta
-        self.v: Dict[int, xp.ndarray] = {}
+        self.supports_sparse = lazy
         self.nesterov = nesterov  # s obzirom na sličnosti, ista klasa može vršiti i ažuriranje
         # u skladu sa Nesterovom modifikacijom momentuma.
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        if address(params) not in self.v:
-            self.v[address(params)] = xp.zeros_like(grad)
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {"v": xp.zeros_like(param)}
 
-        v = self.v[address(params)]
-        v = self.beta * v + self.lr * grad
-        self.v[address(params)] = v
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        v, step = state["v"], scratch[0]
+        self._finish_lazy(state, t - 1)
+        xp.multiply(grad, self.lr, out=step)
+        v *= self.beta
+        v += step
 
         if self.nesterov:
-            params -= (self.beta * v + self.lr * grad)
+            param -= step
+            xp.multiply(v, self.beta, out=step)
+            param -= step
         else:
-            params -= v
+            param -= v
+
+    def _decay(self, state: Dict[str, xp.ndarray], steps: xp.ndarray):
+        state["v"] *= self.beta ** steps
+
+    def _sparse_update(self, param: xp.ndarray, grad: SparseGradient, state: Dict[str, xp.ndarray],
+                       scratch: List[xp.ndarray], t: int):
+        key, values = grad.key(grad.indices), grad.values
+        step = scratch[0].reshape(-1)[:values.size].reshape(values.shape)
+        v = state["v"][key]
+        v *= self.beta ** (self._lazy_steps(param, grad, state, t) + 1)
+        xp.multiply(values, self.lr, out=step)
+        v += step
+        state["v"][key] = v
 
-        return params
+        if self.nesterov:
+            v *= self.beta
+            step += v
+            param[key] -= step
+        else:
+            param[key] -= v
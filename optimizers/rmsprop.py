@@ -1,7 +1,8 @@
-from typing import Dict
+from typing import Dict, List
 
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
-from backend.backend import xp, address
+from optimizers.sparse_gradient import SparseGradient
 
 
 class RMSProp(Optimizer):
@@ -17,21 +18,52 @@ class RMSProp(Optimizer):
 
     By accumulating squared gradients, RMSProp increases updates for parameters that change rarely and decreases them for
     those that change frequently.
+
+    Where the gradient is zero the parameter does not change and E[g²] only decays, so for a SparseGradient only the
+    slices it names are updated: a slice that missed k steps has its E[g²] multiplied by βᵏ first, which gives the same
+    result as the dense update.
     """
 
+    supports_sparse = True
+
     def __init__(self, lr: float = 0.001, beta: float = 0.9):
         super().__init__(lr)
         self.beta = beta
-        self.grad_sq: Dict[int, xp.ndarray] = {}
         self.eps = 1e-8
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        if address(params) not in self.grad_sq:
-            self.grad_sq[address(params)] = xp.zeros_like(grad)
+    def _init_state(self, param: xp.ndarray) -> Dict[str, xp.ndarray]:
+        return {"grad_sq": xp.zeros_like(param)}
+
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        grad_sq, step = state["grad_sq"], scratch[0]
+        self._finish_lazy(state, t - 1)
+        xp.multiply(grad, grad, out=step)
+        step *= 1 - self.beta
+        grad_sq *= self.beta
+        grad_sq += step
+
+        xp.add(grad_sq, self.eps, out=step)
+        xp.sqrt(step, out=step)
+        xp.divide(grad, step, out=step)
+        step *= self.lr
+        param -= step
+
+    def _decay(self, state: Dict[str, xp.ndarray], steps: xp.ndarray):
+        state["grad_sq"] *= self.beta ** steps
 
-        grad_sq = self.grad_sq[address(params)]
-        grad_sq = self.beta * grad_sq + (1 - self.beta) * grad * grad
-        self.grad_sq[address(params)] = grad_sq
-        params -= self.lr * grad / xp.sqrt(grad_sq + self.eps)
+    def _sparse_update(self, param: xp.ndarray, grad: SparseGradient, state: Dict[str, xp.ndarray],
+                       scratch: List[xp.ndarray], t: int):
+        key, values = grad.key(grad.indices), grad.values
+        step = scratch[0].reshape(-1)[:values.size].reshape(values.shape)
+        grad_sq = state["grad_sq"][key]
+        grad_sq *= self.beta ** (self._lazy_steps(param, grad, state, t) + 1)
+        xp.multiply(values, values, out=step)
+        step *= 1 - self.beta
+        grad_sq += step
+        state["grad_sq"][key] = grad_sq
 
-        return params
+        xp.add(grad_sq, self.eps, out=step)
+        xp.sqrt(step, out=step)
+        xp.divide(values, step, out=step)
+        step *= self.lr
+        param[key] -= step
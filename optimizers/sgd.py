@@ -1,6 +1,8 @@
-from backend.backend import xp
+from typing import Dict, List
 
+from backend.backend import xp
 from optimizers.abstract_optimizer import Optimizer
+from optimizers.sparse_gradient import SparseGradient
 
 
 class SGD(Optimizer):
@@ -8,10 +10,22 @@ class SGD(Optimizer):
     Basic gradient descent is the simplest optimization algorithm. Parameters are updated as
     x = x − lr * g,
     where lr is the learning rate and g is the gradient.
+
+    Slices where the gradient is zero do not change, so for a SparseGradient only the slices it names are updated.
     """
+
+    supports_sparse = True
+
     def __init__(self, lr: float = 0.01):
         super().__init__(lr)
 
-    def update_parameters(self, params: xp.ndarray, grad: xp.ndarray) -> xp.ndarray:
-        params -= self.lr * grad
-        return params
+    def _update(self, param: xp.ndarray, grad: xp.ndarray, state: Dict[str, xp.ndarray], scratch: List[xp.ndarray], t: int):
+        step = scratch[0]
+        xp.multiply(grad, self.lr, out=step)
+        param -= step
+
+    def _sparse_update(self, param: xp.ndarray, grad: SparseGradient, state: Dict[str, xp.ndarray],
+                       scratch: List[xp.ndarray], t: int):
+        step = scratch[0].reshape(-1)[:grad.values.size].reshape(grad.values.shape)
+        xp.multiply(grad.values, self.lr, out=step)
+        param[grad.key(grad.indices)] -= step
@@ -0,0 +1,49 @@
+from backend.backend import xp
+
+
+class SparseGradient:
+    """
+    Describes a gradient that is zero except for a few slices along one axis, such as the columns of the weights of a
+    DenseLayer that belong to the features present in a sparse minibatch.
+
+    The layer still keeps the dense gradient array, so everything that works with gradients (zeroing, norms, flat
+    buffers, gradient accumulation, optimizers without sparse support) sees the exact gradient. scatter writes the
+    nonzero slices into it and zeroes only the slices written the step before, instead of the whole array, and records
+    indices and values, which optimizers with supports_sparse use to update only these slices of the parameter. With
+    axis=0 these are the rows of a table, as in the gradient of an Embedding; optimizers whose state decays (RMSProp,
+    Adam and Momentum with lazy=True) catch the rows up on the steps they missed when they next receive a gradient.
+    """
+
+    def __init__(self, axis: int = 0):
+        self.axis = axis
+        self.indices: xp.ndarray = None  # the slices written by the last scatter, None if the whole array may be nonzero
+        self.values: xp.ndarray = None
+        self.active = False  # whether indices and values describe the gradient of the current step
+
+    def key(self, indices: xp.ndarray) -> tuple:
+        """
+        The index expression selecting the given slices, e.g. param[gradient.key(indices)].
+        """
+        return (slice(None),) * self.axis + (indices,)
+
+    def scatter(self, dense: xp.ndarray, indices: xp.ndarray, values: xp.ndarray):
+        """
+        Makes dense the gradient whose slices at indices (unique) hold values and which is zero elsewhere.
+        """
+        if self.indices is None:
+            dense.fill(0)
+        else:
+            dense[self.key(self.indices)] = 0
+        dense[self.key(indices)] = values
+
+        self.indices = indices
+        self.values = values
+        self.active = True
+
+    def reset(self):
+        """
+        Called when the dense gradient was written by other means, so any of its slices may be nonzero.
+        """
+        self.indices = None
+        self.values = None
+        self.active = False
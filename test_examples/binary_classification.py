@@ -78,12 +78,12 @@ def test_binary_classification():
     """
     HEART 
     Training time = 0.009022712707519531 seconds
-    Parameters saved at saved_models/bin_class_heart.pickle
+    Parameters saved at saved_models/bin_class_heart.ckpt
     Test set loss = 0.35119644770439135
     Metric: accuracy, value: 0.913
     
     Training time = 0.03310084342956543 seconds
-    Parameters saved at saved_models/bin_class_heart.pickle
+    Parameters saved at saved_models/bin_class_heart.ckpt
     Test set loss = 0.23189195297890325
     Metric: accuracy, value: 0.9126
     """
\ No newline at end of file
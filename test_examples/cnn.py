@@ -0,0 +1,48 @@
+from backend.backend import xp
+from layers.activation_functions.relu import ReLU
+from layers.convolutional.conv2d import Conv2D
+from layers.convolutional.pooling import MaxPool2D
+from layers.dense_layer import DenseLayer
+from layers.flatten import Flatten
+from loss_functions.cross_entropy import CrossEntropy
+from metrics.metrics import Accuracy
+from models.feedforward_nn import Model
+from optimizers.adam import Adam
+from utils.utils import get_8x8_mnist_data
+
+
+def test_CNN():
+    """
+    A small convolutional network on the 8 × 8 digits bundled with scikit-learn, whose images come as Nb × 1 × 8 × 8.
+    """
+    X, y = get_8x8_mnist_data()
+    X = X / 16
+
+    training_data_size = int(len(X) * 0.8)
+    train_X, train_y = X[:training_data_size], y[:training_data_size]
+    test_X, test_y = X[training_data_size:], y[training_data_size:]
+
+    xp.random.seed(0)
+    model = Model(name="cnn_digits")
+    model.add_layer(Conv2D(1, 16, kernel_size=3, padding=1, name="Conv 1"))
+    model.add_layer(ReLU())
+    model.add_layer(Conv2D(16, 32, kernel_size=3, padding=1, name="Conv 2"))
+    model.add_layer(ReLU())
+    model.add_layer(MaxPool2D(2))
+    model.add_layer(Flatten())
+    model.add_layer(DenseLayer(32 * 4 * 4, 10, name="Output"))
+
+    model.set_loss(CrossEntropy(from_logits=True))
+    model.set_optimizer(Adam(lr=0.002))
+    accuracy = Accuracy()
+
+    model.fit((train_X, train_y), batch_size=32, max_epochs=10, print_every=5, metrics=[accuracy])
+    test_accuracy = Accuracy()
+    model.evaluate((test_X, test_y), metrics=[test_accuracy])
+
+    """
+    Training time = 4.694498777389526 seconds
+    Parameters saved at saved_models/cnn_digits.ckpt
+    Test set loss = 0.050934517573590465
+    Metric: accuracy, value: 0.9889
+    """
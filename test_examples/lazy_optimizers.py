@@ -0,0 +1,48 @@
+from backend.backend import xp
+from optimizers.adagrad import Adagrad
+from optimizers.adam import Adam
+from optimizers.momentum import Momentum
+from optimizers.rmsprop import RMSProp
+from optimizers.sparse_gradient import SparseGradient
+
+
+def train_table(optimizer, lazy: bool, rebind: bool, rows: int = 6, units: int = 3, steps: int = 3):
+    """
+    Updates a table of which every step touches a different row, followed by one dense step of all rows, and returns
+    the optimizer state. With lazy=True the sparse steps update only the touched rows, and with rebind=True the group
+    is rebound to a flat copy of the table before the dense step, as Model.flatten_parameters does.
+    """
+    table = xp.zeros((rows, units))
+    grad = xp.zeros_like(table)
+    sparse = SparseGradient(axis=0)
+    group = optimizer.register([table], [grad], [sparse] if lazy else None)
+
+    for step in range(steps):
+        sparse.scatter(grad, xp.array([step]), xp.ones((1, units)))
+        optimizer.step(group)
+
+    if rebind:
+        flat, flat_grad = table.reshape(-1).copy(), grad.reshape(-1).copy()
+        group.rebind([flat], [flat_grad])
+        table, grad = flat.reshape(rows, units), flat_grad.reshape(rows, units)
+    grad.fill(1)
+    sparse.reset()
+    optimizer.step(group)
+    return {key: value.reshape(rows, units) for key, value in group.state[0].items()}
+
+
+def test_lazy_optimizers():
+    """
+    Lazy updates decay the state of every row for the steps it missed, so after a dense step the moments are the same
+    as if every step had been dense, whether or not the group was rebound in between.
+    """
+    optimizers = {'Adagrad': Adagrad, 'RMSProp': RMSProp, 'Momentum': lambda: Momentum(lazy=True),
+                  'Adam': lambda: Adam(lazy=True)}
+    for name, create in optimizers.items():
+        dense = train_table(create(), lazy=False, rebind=False)
+        for rebind in (False, True):
+            lazy = train_table(create(), lazy=True, rebind=rebind)
+            assert dense.keys() == lazy.keys(), name
+            for key in dense:
+                assert xp.allclose(dense[key], lazy[key]), (name, key, rebind)
+        print("{:10s} lazy state matches dense updates".format(name))
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pandas as pd
+
+from data_scalers.scalers import *
+from layers.activation_functions.relu import ReLU
+from layers.dense_layer import DenseLayer
+from layers.embedding import Embedding
+from layers.flatten import Flatten
+from loss_functions.binary_cross_entropy import BinaryCrossEntropy
+from loss_functions.mse import MSE
+from metrics.metrics import BinaryAccuracy
+from models.feedforward_nn import Model
+from optimizers.momentum import Momentum
+from optimizers.sgd import SGD
+from utils.dataset import Dataset
+
+
+def build_model(input_units: int, name: str) -> Model:
+    xp.random.seed(0)
+    model = Model(name=name)
+    model.add_layer(DenseLayer(input_units, 64, name='Dense layer 1'))
+    model.add_layer(ReLU())
+    model.add_layer(DenseLayer(64, 64, name='Dense layer 2'))
+    model.add_layer(ReLU())
+    model.add_layer(DenseLayer(64, 1, name='Dense layer 3'))
+    model.set_loss(BinaryCrossEntropy(from_logits=True))
+    model.set_optimizer(Momentum(lr=0.01))
+    return model
+
+
+def test_parallel_training():
+    """
+    Compares the throughput and convergence of single-process training, synchronous data-parallel training (Model.fit
+    with workers) and asynchronous Hogwild training (Model.fit_hogwild) on the banknote authentication dataset.
+    """
+    file = pd.read_csv('data/banknote_authentication.csv')
+    data = xp.array(file.values)
+    xp.random.shuffle(data)
+
+    training_data_size = int(len(data) * 0.7)
+    X, y = data[:, :-1], data[:, -1]
+    train_X, train_y = X[:training_data_size], y[:training_data_size]
+    test_X, test_y = X[training_data_size:], y[training_data_size:]
+
+    scaler = StandardScaler()
+    scaler.adapt(train_X)
+    train_X = scaler.transform(train_X)
+    test_X = scaler.transform(test_X)
+
+    workers = min(os.cpu_count(), 4)
+    epochs = 20
+    results = []
+
+    for mode in ("single process", "data parallel", "hogwild"):
+        model = build_model(train_X.shape[1], "parallel_" + mode.replace(' ', '_'))
+        start_time = time.time()
+        if mode == "single process":
+            model.fit((train_X, train_y), batch_size=32, max_epochs=epochs, print_every=epochs, eps=0)
+        elif mode == "data parallel":
+            model.fit((train_X, train_y), batch_size=32, max_epochs=epochs, print_every=epochs, eps=0, workers=workers)
+        else:
+            model.fit_hogwild((train_X, train_y), batch_size=32, max_epochs=epochs, print_every=epochs, workers=workers)
+        samples_per_second = len(train_X) * epochs / (time.time() - start_time)
+
+        accuracy = BinaryAccuracy(from_logits=True)
+        loss = model.evaluate((test_X, test_y), metrics=[accuracy])
+        results.append((mode, samples_per_second, loss, accuracy.last_epoch_value()))
+
+    for mode, samples_per_second, loss, accuracy in results:
+        print("{:15s} {:10.0f} samples/s, test loss = {:.4f}, accuracy = {}".format(mode, samples_per_second, loss,
+                                                                                     accuracy))
+
+
+def test_parallel_embedding():
+    """
+    Trains a model whose first layer is an Embedding, which has a sparse gradient, for several epochs in a single process
+    and with synchronous data-parallel training, and checks that both end with the same parameters.
+    """
+    rng = xp.random.RandomState(0)
+    X = rng.randint(0, 30, (128, 3))
+    y = rng.normal(size=(128, 2))
+
+    parameters = []
+    for workers in (1, 2):
+        xp.random.seed(0)
+        model = Model(MSE(), name='parallel_embedding')
+        model.add_layer(Embedding(30, 4, name='Embedding'))
+        model.add_layer(Flatten())
+        model.add_layer(DenseLayer(12, 2, name='Dense layer'))
+        model.set_optimizer(SGD(lr=0.1))
+        model.fit(Dataset(X, y, shuffle=False), batch_size=16, max_epochs=3, print_every=3, eps=0, workers=workers,
+                  save=False)
+        parameters.append([getattr(layer, param).copy() for layer, param, _ in model._trainable_slots()])
+
+    difference = max(float(xp.abs(a - b).max()) for a, b in zip(*parameters))
+    assert difference < 1e-10, difference
+    print("largest difference between single-process and data-parallel parameters: {:.3g}".format(difference))
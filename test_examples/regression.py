@@ -55,7 +55,7 @@ def test_regression():
 
     """
     Training time = 0.0010039806365966797 seconds
-    Parameters saved at saved_models/regression_1.pickle
+    Parameters saved at saved_models/regression_1.ckpt
     Test set loss = 0.024888369058985962
     Metric: MSE, value: 0.0498
     """
\ No newline at end of file
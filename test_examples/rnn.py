@@ -0,0 +1,53 @@
+from backend.backend import xp
+from layers.dense_layer import DenseLayer
+from layers.embedding import Embedding
+from layers.recurrent.gru import GRU
+from layers.recurrent.lstm import LSTM
+from layers.recurrent.rnn import RNN
+from loss_functions.cross_entropy import CrossEntropy
+from metrics.metrics import Accuracy
+from models.feedforward_nn import Model
+from optimizers.adam import Adam
+from utils.utils import generate_int_sequences, generate_vocabulary
+
+TEXT = """twinkle, twinkle, little star,
+how i wonder what you are!
+up above the world so high,
+like a diamond in the sky.
+when the blazing sun is gone,
+when he nothing shines upon,
+then you show your little light,
+twinkle, twinkle, all the night."""
+
+
+def train_character_model(recurrent_layer, name: str, max_epochs: int = 150):
+    """
+    Trains recurrent_layer followed by a DenseLayer applied at every timestep to predict the next character of every
+    line of TEXT, and returns the accuracy of the predictions. The characters are fed as indices to an Embedding layer,
+    and the targets are the indices of the next characters.
+    """
+    X, y = generate_int_sequences(TEXT, seq_delimiter='\n')
+    vocabulary_size = len(generate_vocabulary(TEXT, '.')[0])
+
+    model = Model(name=name)
+    model.add_layer(Embedding(vocabulary_size, 16, name="Embedding"))
+    model.add_layer(recurrent_layer(16))
+    model.add_layer(DenseLayer(64, vocabulary_size, name="Output"))
+    model.set_loss(CrossEntropy(from_logits=True, one_hot=False))
+    model.set_optimizer(Adam(lr=0.01))
+
+    accuracy = Accuracy(one_hot=False)
+    model.fit((X, y), batch_size=8, max_epochs=max_epochs, print_every=max_epochs, eps=0, metrics=[accuracy])
+    return accuracy.last_epoch_value()
+
+
+def test_basic_RNN():
+    xp.random.seed(0)
+    train_character_model(lambda input_units: RNN(input_units, 64, name="RNN"), "char_rnn")
+
+
+def test_LSTM_GRU():
+    for layer in (LSTM, GRU):
+        xp.random.seed(0)
+        train_character_model(lambda input_units: layer(input_units, 64, name=layer.__name__),
+                              "char_" + layer.__name__.lower())
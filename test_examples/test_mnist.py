@@ -39,7 +39,7 @@ def test_mnist():
 
     """
     Training time = 43.618773221969604 seconds
-    Parameters saved at saved_models/mnist.pickle
+    Parameters saved at saved_models/mnist.ckpt
     Test set loss = 0.3423822664738604
     Metric: accuracy, value: 0.965
     """
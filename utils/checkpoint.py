@@ -0,0 +1,118 @@
+import json
+import struct
+from typing import List, Optional
+
+import numpy
+
+from backend.backend import xp
+
+MAGIC = b'DNNCKPT\x01'
+ALIGNMENT = 64
+
+_HEADER_LENGTH = struct.Struct('<Q')
+
+
+def save(filename: str, params: list, names: Optional[List[str]] = None):
+    """
+    Writes the nested list of parameter arrays (as returned by Model.parameters) to filename.
+
+    The file starts with MAGIC and the length of a JSON header that records the nesting of the list, the names of the
+    layers and the shape, dtype and offset of every array. The raw array data follows, each array starting at a multiple
+    of ALIGNMENT bytes, so load can map the file into memory and use the arrays in place. Everything is written in one
+    sequential pass without building an intermediate copy of the data.
+    """
+    arrays = []
+    header = {'version': 1, 'names': names, 'params': _flatten_tree(params, arrays), 'tensors': []}
+
+    offset = 0
+    for array in arrays:
+        offset = _align(offset)
+        header['tensors'].append({'shape': list(array.shape), 'dtype': array.dtype.str, 'offset': offset})
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(len(MAGIC) + _HEADER_LENGTH.size + len(header_bytes))
+
+    with open(filename, 'wb') as file:
+        file.write(MAGIC)
+        file.write(_HEADER_LENGTH.pack(len(header_bytes)))
+        file.write(header_bytes)
+        position = len(MAGIC) + _HEADER_LENGTH.size + len(header_bytes)
+        for array, tensor in zip(arrays, header['tensors']):
+            file.write(b'\0' * (data_start + tensor['offset'] - position))
+            file.write(array.reshape(-1).view(numpy.uint8))
+            position = data_start + tensor['offset'] + array.nbytes
+
+
+def load(filename: str, mmap_mode: Optional[str] = None) -> list:
+    """
+    Reads a checkpoint written by save and returns the nested list of arrays.
+
+    Without mmap_mode the whole data section is read with a single call into one block of memory and the arrays are
+    views into it. With mmap_mode ('r', 'r+' or 'c', as for numpy.memmap) the file is mapped instead: nothing is read
+    until an array is touched, and processes that map the same file share its pages. Mapped arrays live in host memory;
+    on the CuPy backend they are copied to the device.
+    """
+    with open(filename, 'rb') as file:
+        header, data_start = _read_header(file)
+        size = _data_size(header)
+        if mmap_mode is not None and size > 0:
+            data = numpy.memmap(filename, dtype=numpy.uint8, mode=mmap_mode, offset=data_start, shape=(size,))
+        else:
+            data = numpy.empty(size, dtype=numpy.uint8)
+            file.seek(data_start)
+            file.readinto(memoryview(data))
+
+    arrays = []
+    for tensor in header['tensors']:
+        dtype = numpy.dtype(tensor['dtype'])
+        size = int(numpy.prod(tensor['shape'], dtype=numpy.int64)) * dtype.itemsize
+        array = data[tensor['offset']: tensor['offset'] + size].view(dtype).reshape(tensor['shape'])
+        arrays.append(xp.asarray(array))
+
+    return _build_tree(header['params'], arrays)
+
+
+def is_checkpoint(filename: str) -> bool:
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _read_header(file) -> (dict, int):
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("{} is not a parameter checkpoint".format(file.name))
+    header_length, = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))
+    header = json.loads(file.read(header_length).decode('utf-8'))
+    return header, _align(len(MAGIC) + _HEADER_LENGTH.size + header_length)
+
+
+def _data_size(header: dict) -> int:
+    size = 0
+    for tensor in header['tensors']:
+        count = int(numpy.prod(tensor['shape'], dtype=numpy.int64))
+        size = max(size, tensor['offset'] + count * numpy.dtype(tensor['dtype']).itemsize)
+    return size
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _flatten_tree(params, arrays: list):
+    """
+    Replaces every array of the nested list by its position in arrays, to which it is appended.
+    """
+    if params is None:
+        return None
+    if isinstance(params, (list, tuple)):
+        return [_flatten_tree(p, arrays) for p in params]
+    arrays.append(numpy.ascontiguousarray(params.get() if hasattr(params, 'get') else params))
+    return len(arrays) - 1
+
+
+def _build_tree(tree, arrays: list):
+    if tree is None:
+        return None
+    if isinstance(tree, list):
+        return [_build_tree(t, arrays) for t in tree]
+    return arrays[tree]
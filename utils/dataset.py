@@ -1,35 +1,138 @@
-from typing import Tuple
+from typing import Tuple, Union
+
+import numpy
 
 from backend.backend import xp
+from backend.sparse import issparse
 
 
 class Dataset:
-    def __init__(self, x: xp.ndarray, y: xp.ndarray, batch_size: int = 32, shuffle: bool = True):
+    """
+    Iterates over the data in minibatches of batch_size samples, reshuffling the samples at the end of every epoch.
+
+    Shuffling never moves the data: only a permutation of the sample indices is drawn, and every minibatch is gathered
+    from x and y when it is requested. Without shuffling (and in the first epoch) minibatches are plain slices, which
+    cost no copy at all. Because samples are only read a minibatch at a time, x and y may also be memory-mapped arrays
+    (see from_npy), so datasets larger than the available memory can be used for training; for such datasets the
+    indices of a minibatch are sorted, so the pages of the file are read in order.
+
+    If dtype is set, floating point batches are converted to it as they are produced, so the data can stay in its
+    original precision in memory while the model trains, for example, in float32. Integer data (class labels, indices)
+    is passed on unchanged.
+
+    x may also be a sparse matrix (see backend.sparse); its minibatches are gathered as CSR matrices of the same rows.
+    """
+
+    def __init__(self, x: xp.ndarray, y: xp.ndarray, batch_size: int = 32, shuffle: bool = True, dtype=None):
         self.x = x
         self.y = y
         self.batch_size = batch_size
         self.shuffle = shuffle
         self.batch_index = 0
+        self.dtype = dtype
+        self._order = None  # permutation of the sample indices, None stands for the original order
+
+    @classmethod
+    def from_npy(cls, x_file: str, y_file: str, batch_size: int = 32, shuffle: bool = True, dtype=None) -> 'Dataset':
+        """
+        Creates a dataset backed by memory-mapped .npy files (written, for example, with numpy.save or, for data that
+        does not fit in memory, with numpy.lib.format.open_memmap). Only the pages holding the samples of the current
+        minibatch have to be read from disk.
+        """
+        x = numpy.load(x_file, mmap_mode='r')
+        y = numpy.load(y_file, mmap_mode='r')
+        return cls(x, y, batch_size, shuffle, dtype)
+
+    @property
+    def memory_mapped(self) -> bool:
+        return isinstance(self.x, numpy.memmap) or isinstance(self.y, numpy.memmap)
 
     def __iter__(self):
         return self
 
     def __len__(self):
-        return len(self.x)
+        return self.x.shape[0]  # len() is not defined for sparse matrices
 
     def __next__(self) -> Tuple[xp.ndarray, xp.ndarray]:
         start_i = self.batch_index * self.batch_size
         end_i = (self.batch_index + 1) * self.batch_size
-        if start_i >= len(self.x):
+        if start_i >= len(self):
             self.batch_index = 0
-            if self.shuffle:
-                p = xp.random.permutation(len(self.x))
-                self.x, self.y = self.x[p], self.y[p]
+            self.end_epoch()
             raise StopIteration
         else:
-            end_i = min(end_i, len(self.x))
-            batch_x = self.x[start_i: end_i]
-            batch_y = self.y[start_i: end_i]
+            end_i = min(end_i, len(self))
+            indices = self.batch_indices(start_i, end_i)
             self.batch_index += 1
 
-            return batch_x, batch_y
+            return self.gather(indices)
+
+    def end_epoch(self):
+        """
+        Draws the order of the samples for the next epoch.
+        """
+        if self.shuffle:
+            permutation = _module(self.x).random.permutation(len(self))
+            # composing with the previous order visits the samples exactly as shuffling the data in place would
+            self._order = permutation if self._order is None else self._order[permutation]
+
+    def batch_indices(self, start_i: int, end_i: int) -> Union[slice, xp.ndarray]:
+        """
+        Returns the samples at positions start_i to end_i of the current epoch, as a slice or as an array of indices.
+        """
+        if self._order is None:
+            return slice(start_i, end_i)
+
+        indices = self._order[start_i: end_i]
+        if self.memory_mapped:
+            indices = numpy.sort(indices)
+        return indices
+
+    def gather(self, indices: Union[slice, xp.ndarray], out: Tuple[xp.ndarray, xp.ndarray] = None) \
+            -> Tuple[xp.ndarray, xp.ndarray]:
+        """
+        Returns the samples selected by indices. If out is given, the samples are written into the first rows of the two
+        arrays in out (which must have the dtypes given by batch_dtypes) and views of those rows are returned. Sparse
+        minibatches are always new matrices, so out[0] is ignored (it may be None) when x is sparse.
+        """
+        if out is None:
+            return self._cast(self.x[indices]), self._cast(self.y[indices])
+        x = self._cast(self.x[indices]) if issparse(self.x) else self._take(self.x, indices, out[0])
+        return x, self._take(self.y, indices, out[1])
+
+    def batch_dtypes(self) -> Tuple[xp.dtype, xp.dtype]:
+        return self._batch_dtype(self.x), self._batch_dtype(self.y)
+
+    def _batch_dtype(self, array: xp.ndarray) -> xp.dtype:
+        if self.dtype is None or not xp.issubdtype(array.dtype, xp.floating):
+            return array.dtype
+        return xp.dtype(self.dtype)
+
+    @staticmethod
+    def _take(array: xp.ndarray, indices: Union[slice, xp.ndarray], out: xp.ndarray) -> xp.ndarray:
+        if isinstance(indices, slice):
+            out = out[:len(range(*indices.indices(len(array))))]
+            out[...] = array[indices]
+        else:
+            out = out[:len(indices)]
+            if out.dtype == array.dtype and _module(out) is _module(array):
+                _module(array).take(array, indices, axis=0, out=out, mode='clip')
+            else:
+                out[...] = array[indices]
+        return out
+
+    def _cast(self, batch: xp.ndarray) -> xp.ndarray:
+        if issparse(batch):
+            batch = batch.tocsr()
+        else:
+            batch = xp.asarray(batch)
+        if self.dtype is None or not xp.issubdtype(batch.dtype, xp.floating):
+            return batch
+        return batch.astype(self.dtype, copy=False)
+
+
+def _module(array) -> object:
+    """
+    NumPy for arrays in host memory (including memory-mapped arrays), the backend module otherwise.
+    """
+    return numpy if isinstance(array, numpy.ndarray) else xp
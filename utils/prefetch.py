@@ -0,0 +1,161 @@
+import queue
+import threading
+from typing import List, Tuple
+
+import numpy
+
+from backend.backend import xp
+from backend.sparse import issparse
+from utils.dataset import Dataset
+
+
+class PrefetchLoader:
+    """
+    Wraps a Dataset and prepares the next depth minibatches in a background thread while the model computes on the
+    current one, so gathering the samples of a shuffled or memory-mapped dataset and converting them to the dtype of the
+    model is kept off the critical path. NumPy releases the GIL while it copies, so the two threads run concurrently.
+
+    The batches are written into a ring of depth + 2 reusable buffers: depth batches waiting in the queue, one being
+    filled and one being used by the model. A batch therefore stays valid only until the next batch is requested, which
+    is how Model consumes them. If data lives in host memory and the backend is CuPy, the buffers are allocated in pinned
+    memory so the transfer to the device can run at full speed. Sparse inputs get no buffers: their minibatches are new
+    matrices anyway.
+
+    The loader follows the iteration protocol of Dataset and can be passed to Model.fit and Model.evaluate instead of it:
+        model.fit(PrefetchLoader(Dataset.from_npy('x.npy', 'y.npy')), batch_size=128)
+    """
+
+    def __init__(self, data: Dataset, depth: int = 2):
+        if depth < 1:
+            raise ValueError("The prefetch depth must be at least 1")
+
+        self.data = data
+        self.depth = depth
+        self._buffers: List[Tuple[xp.ndarray, xp.ndarray]] = []
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def batch_size(self) -> int:
+        return self.data.batch_size
+
+    @batch_size.setter
+    def batch_size(self, val: int):
+        self.data.batch_size = val
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @dtype.setter
+    def dtype(self, val):
+        self.data.dtype = val
+
+    @property
+    def shuffle(self) -> bool:
+        return self.data.shuffle
+
+    @property
+    def x(self) -> xp.ndarray:
+        return self.data.x
+
+    @property
+    def y(self) -> xp.ndarray:
+        return self.data.y
+
+    def batch_dtypes(self) -> Tuple[xp.dtype, xp.dtype]:
+        return self.data.batch_dtypes()
+
+    def gather(self, indices, out: Tuple[xp.ndarray, xp.ndarray] = None) -> Tuple[xp.ndarray, xp.ndarray]:
+        return self.data.gather(indices, out)
+
+    def __iter__(self):
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+    def __next__(self) -> Tuple[xp.ndarray, xp.ndarray]:
+        if self._thread is None:
+            self._start()
+
+        item = self._queue.get()
+        if item is None:
+            self._thread.join()
+            self._thread = None
+            raise StopIteration
+        if isinstance(item, BaseException):
+            self._thread.join()
+            self._thread = None
+            raise item
+
+        batch_x, batch_y = item
+        return batch_x if issparse(batch_x) else xp.asarray(batch_x), xp.asarray(batch_y)
+
+    def close(self):
+        """
+        Stops the background thread, discarding the batches it has prepared. The next epoch starts from the beginning.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._thread = None
+        self._stop.clear()
+
+    def __del__(self):
+        if getattr(self, '_thread', None) is not None:
+            self.close()
+
+    def _start(self):
+        self._allocate_buffers()
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _allocate_buffers(self):
+        x_dtype, y_dtype = self.data.batch_dtypes()
+        x_shape = (self.batch_size,) + self.data.x.shape[1:]
+        y_shape = (self.batch_size,) + self.data.y.shape[1:]
+        sparse = issparse(self.data.x)
+        if self._buffers and (self._buffers[0][0] is None) == sparse and \
+                (sparse or self._buffers[0][0].shape == x_shape and self._buffers[0][0].dtype == x_dtype) \
+                and self._buffers[0][1].shape == y_shape and self._buffers[0][1].dtype == y_dtype:
+            return
+
+        empty = _empty_pinned if isinstance(self.data.x, numpy.ndarray) and xp is not numpy else xp.empty
+        self._buffers = [(None if sparse else empty(x_shape, x_dtype), empty(y_shape, y_dtype))
+                         for _ in range(self.depth + 2)]
+
+    def _produce(self):
+        try:
+            n = len(self.data)
+            for i, start_i in enumerate(range(0, n, self.batch_size)):
+                indices = self.data.batch_indices(start_i, min(start_i + self.batch_size, n))
+                batch = self.data.gather(indices, self._buffers[i % len(self._buffers)])
+                if not self._put(batch):
+                    return
+            self.data.end_epoch()
+            self._put(None)
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.01)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+def _empty_pinned(shape: tuple, dtype) -> numpy.ndarray:
+    import cupyx
+    return cupyx.empty_pinned(shape, dtype)
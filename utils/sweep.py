@@ -0,0 +1,145 @@
+import contextlib
+import io
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy
+import pandas as pd
+
+from backend.backend import xp
+from backend.shared_memory import attach_array, share_array
+from utils.dataset import Dataset
+
+FIT_ARGUMENTS = ('batch_size', 'max_epochs', 'eps')
+BLAS_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                         'NUMEXPR_NUM_THREADS')
+
+_worker_data: Dict[str, xp.ndarray] = {}
+_worker_blocks = []
+
+
+def grid_search(space: Dict[str, list]) -> List[dict]:
+    """
+    Every combination of the values listed for each hyperparameter, e.g.
+        grid_search({'lr': [0.01, 0.001], 'units': [16, 32]})
+    gives four configurations.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search(space: Dict[str, object], num_trials: int, seed: int = None) -> List[dict]:
+    """
+    num_trials configurations drawn at random. The value of each hyperparameter is drawn from a list of choices, from a
+    function that takes a numpy.random.Generator (see uniform and log_uniform), or is a constant.
+    """
+    rng = numpy.random.default_rng(seed)
+    configs = []
+    for _ in range(num_trials):
+        config = {}
+        for name, values in space.items():
+            if callable(values):
+                config[name] = values(rng)
+            elif isinstance(values, (list, tuple)):
+                config[name] = values[rng.integers(len(values))]
+            else:
+                config[name] = values
+        configs.append(config)
+    return configs
+
+
+def uniform(low: float, high: float) -> Callable[[numpy.random.Generator], float]:
+    return lambda rng: float(rng.uniform(low, high))
+
+
+def log_uniform(low: float, high: float) -> Callable[[numpy.random.Generator], float]:
+    """
+    Values whose logarithm is uniformly distributed, which suits scale parameters such as learning rates.
+    """
+    return lambda rng: float(numpy.exp(rng.uniform(numpy.log(low), numpy.log(high))))
+
+
+def sweep(build_model: Callable, configs: List[dict],
+          train_data: Tuple[xp.ndarray, xp.ndarray], val_data: Tuple[xp.ndarray, xp.ndarray] = None,
+          metrics: List[Callable] = (), workers: int = None, threads_per_worker: int = 1) -> pd.DataFrame:
+    """
+    Trains and evaluates one model for every configuration on a pool of workers processes (the number of CPUs by
+    default) and returns a table with one row per trial, sorted by the loss.
+
+    build_model(config) creates a compiled Model (layers, loss and optimizer) for a configuration. The keys batch_size,
+    max_epochs and eps of the configuration are also passed to Model.fit. The model is evaluated on val_data, or on
+    train_data if val_data is not given; metrics lists metric classes (or other functions creating a metric), because
+    every trial needs metrics of its own. The table holds the configuration, the loss, the value of every metric, the
+    time the trial took and the error message of trials that failed.
+
+    The data is copied once into shared memory, where every worker finds it, instead of being sent with every trial. The
+    workers are started with the spawn method, so build_model must be a module-level function, and each of them limits
+    its BLAS library to threads_per_worker threads, so that the pool does not oversubscribe the cores.
+    """
+    if workers is None:
+        workers = os.cpu_count()
+
+    blocks = []
+    descriptions = {}
+    arrays = {'train_x': train_data[0], 'train_y': train_data[1]}
+    if val_data is not None:
+        arrays.update(val_x=val_data[0], val_y=val_data[1])
+
+    environment = {name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES}
+    try:
+        for key, array in arrays.items():
+            block, descriptions[key] = share_array(xp.asnumpy(array) if xp is not numpy else array)
+            blocks.append(block)
+
+        os.environ.update({name: str(threads_per_worker) for name in BLAS_THREAD_VARIABLES})
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_attach, initargs=(descriptions,)) as pool:
+            futures = [pool.submit(_run_trial, build_model, config, list(metrics)) for config in configs]
+            rows = [future.result() for future in futures]
+    finally:
+        for name, value in environment.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return pd.DataFrame(rows).sort_values('loss', na_position='last').reset_index(drop=True)
+
+
+def _attach(descriptions: Dict[str, tuple]):
+    for key, description in descriptions.items():
+        block, array = attach_array(description)
+        _worker_blocks.append(block)
+        _worker_data[key] = array
+
+
+def _run_trial(build_model: Callable, config: dict, metrics: List[Callable]) -> dict:
+    row = dict(config)
+    start_time = time.time()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = build_model(config)
+            fit_arguments = {name: config[name] for name in FIT_ARGUMENTS if name in config}
+            model.fit(Dataset(_worker_data['train_x'], _worker_data['train_y']), save=False, **fit_arguments)
+
+            evaluated = [metric() for metric in metrics]
+            if 'val_x' in _worker_data:
+                test_data = Dataset(_worker_data['val_x'], _worker_data['val_y'], 64, shuffle=False)
+            else:
+                test_data = Dataset(_worker_data['train_x'], _worker_data['train_y'], 64, shuffle=False)
+            row['loss'] = float(model.evaluate(test_data, evaluated))
+        for metric in evaluated:
+            row[metric.name] = metric.last_epoch_value()
+        row['error'] = None
+    except Exception as e:
+        row['loss'] = numpy.nan
+        row['error'] = "{}: {}".format(type(e).__name__, e)
+    row['time'] = time.time() - start_time
+    return row
@@ -1,6 +1,7 @@
 import string
 from typing import Union, Optional, List
 
+import numpy
 import pandas as pd
 from sklearn.datasets import load_digits
 
@@ -71,6 +72,44 @@ def generate_sequences(text: str, seq_delimiter: Optional[str] = '\n',
     return xp.array(data_X), xp.array(data_y)
 
 
+def generate_int_sequences(text: str, seq_delimiter: Optional[str] = '\n',
+                           seq_length: Union[int, str] = 'auto', padding: str = ".", dtype=xp.int32) \
+        -> (xp.ndarray, xp.ndarray):
+    """
+    The sequences of generate_sequences, encoded as Nb × T arrays of character indices (see generate_vocabulary)
+    instead of Nb × T × V one-hot tensors, for an Embedding layer and losses taking class indices. The whole text is
+    encoded at once: characters are mapped to indices with a sorted lookup table, and every character is placed at its
+    line and column of the result with a single scatter, so no Python loop runs over the characters.
+    """
+    char_to_int, _ = generate_vocabulary(text, padding)
+    if seq_delimiter is None and seq_length == "auto":
+        raise Exception("Either seq_length or sequence_delimiter must be specified!")
+
+    chars = numpy.array([ord(c) for c in char_to_int], dtype=numpy.uint32)
+    order = numpy.argsort(chars)
+    codes = numpy.frombuffer(text.encode('utf-32-le'), dtype=numpy.uint32)
+    encoded = order[numpy.searchsorted(chars[order], codes)].astype(dtype)
+
+    if seq_delimiter is None:
+        num_of_sequences = (len(encoded) - 1) // seq_length
+        end = num_of_sequences * seq_length
+        return xp.asarray(encoded[:end].reshape(-1, seq_length)), xp.asarray(encoded[1: end + 1].reshape(-1, seq_length))
+
+    if len(seq_delimiter) != 1:
+        raise Exception("Only single-character sequence delimiters are supported!")
+    is_delimiter = codes == ord(seq_delimiter)
+    line = numpy.cumsum(is_delimiter) - is_delimiter  # the delimiter closes its line
+    line_start = numpy.flatnonzero(numpy.concatenate(([True], is_delimiter[:-1])))
+    column = numpy.arange(len(codes)) - line_start[line]
+    if seq_length == 'auto':
+        seq_length = int(column[~is_delimiter].max(initial=-1)) + 1
+
+    table = numpy.full((len(line_start), seq_length + 1), char_to_int[padding], dtype=dtype)
+    keep = ~is_delimiter & (column <= seq_length)
+    table[line[keep], column[keep]] = encoded[keep]
+    return xp.asarray(table[:, :-1]), xp.asarray(table[:, 1:])
+
+
 def read_txt_books() -> str:
     import glob
     import os
@@ -158,8 +197,8 @@ def get_8x8_mnist_data(flat_images: bool = False, max_num_of_samples: int = None
     return X, y
 
 
-def to_one_hot(t: xp.ndarray, num_of_classes: int):
-    tmp = xp.zeros((t.size, num_of_classes), dtype=float)
+def to_one_hot(t: xp.ndarray, num_of_classes: int, dtype=float):
+    tmp = xp.zeros((t.size, num_of_classes), dtype=dtype)
     tmp[xp.arange(0, t.size), t.astype(int).squeeze()] = xp.ones(t.size)
     return tmp
 
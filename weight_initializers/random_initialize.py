@@ -1,20 +1,28 @@
-from backend.backend import xp
+from backend.backend import xp, floatx
 
 xp.random.seed(0)
 
 
-def rand_init(n: int, m: int, init_mode: str = 'xavier_uniform') -> xp.ndarray:
+def rand_init(n: int, m: int, init_mode: str = 'xavier_uniform', dtype=None) -> xp.ndarray:
+    """
+    Returns an n × m matrix of random weights of the given dtype (backend.floatx() by default). Values are always drawn
+    in float64, so a model gets the same initial weights, up to rounding, whatever its dtype.
+    """
+    if dtype is None:
+        dtype = floatx()
 
     if init_mode.lower() == 'he_uniform':
         a = xp.sqrt(1 / m)
-        return xp.random.uniform(size=(n, m), low=-a, high=a)
-    if init_mode == 'xavier_uniform':
+        w = xp.random.uniform(size=(n, m), low=-a, high=a)
+    elif init_mode == 'xavier_uniform':
         limit = xp.sqrt(6 / (n+m))
-        return xp.random.uniform(size=(n, m), low=-limit, high=limit)
-    if init_mode.lower() == 'xavier_normal':
+        w = xp.random.uniform(size=(n, m), low=-limit, high=limit)
+    elif init_mode.lower() == 'xavier_normal':
         std = xp.sqrt(2 / (m + n))
-        return xp.random.normal(loc=0, scale=std, size=(n, m))
+        w = xp.random.normal(loc=0, scale=std, size=(n, m))
+    else:
+        w = xp.random.randn(n, m)
 
-    return xp.random.randn(n, m)
+    return w.astype(dtype, copy=False)
 
 